@@ -3,6 +3,7 @@ from .coordination import CoordinationAgent
 from .risk import RiskAgent
 from .reporting import ReportingAgent
 from .orchestrator import AgentOrchestrator, get_orchestrator
+from .snapshot import TaskTable
 
 __all__ = [
     "PlanningAgent",
@@ -11,4 +12,5 @@ __all__ = [
     "ReportingAgent",
     "AgentOrchestrator",
     "get_orchestrator",
+    "TaskTable",
 ]
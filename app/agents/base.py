@@ -2,16 +2,56 @@
 Base Agent Class - Foundation for all PM agents.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+import re
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
+from app.agents.context import PromptContext
 from app.core.llm import get_llm_client, LLMClient
+from app.core.tracing import span
 from app.models import AgentOutput, AgentRecommendation
 
+# Response field names (lowercased, markup stripped) -> what they populate
+RESPONSE_KEYS = {
+    "status": "status",
+    "status summary": "status",
+    "risks": "risks",
+    "key risks": "risks",
+    "recommendations": "recommendations",
+    "title": "title",
+    "priority": "priority",
+    "severity": "priority",
+    "category": "category",
+    "suggestion": "suggestion",
+    "action": "suggestion",
+    "reason": "reasoning",
+    "reasoning": "reasoning",
+    "affects": "affected_entities",
+    "affected": "affected_entities",
+    "affected entities": "affected_entities",
+}
+
+BULLET_CHARS = frozenset("-*•+#>0123456789")
+BULLET_RE = re.compile(r"^(?:#{1,6}\s+|>\s*)?([-*•+]\s+|\d{1,2}[.)]\s+)?")
+MARKUP_RE = re.compile(r"\*\*|__|`")
+PRIORITY_RE = re.compile(r"\b(low|medium|high|critical)\b")
+
 
 class BaseAgent(ABC):
     """Abstract base class for all PM workflow agents."""
     
+    # Fields read from each project state section, used by the state loader
+    # to build Mongo projections. Subclasses that read more (or less) of the
+    # state override this; sections left out are not loaded at all.
+    required_fields: Dict[str, Tuple[str, ...]] = {
+        "project": ("name", "target_end_date"),
+        "tasks": ("title", "status", "due_date", "assignee_id", "dependencies"),
+        "milestones": ("title", "is_completed", "target_date"),
+        "risks": ("title", "level", "is_resolved"),
+        "recent_events": ("event_type", "entity_type", "details"),
+        "velocity": (),
+    }
+    
     def __init__(self, name: str):
         self.name = name
         self.llm: LLMClient = get_llm_client()
@@ -36,84 +76,123 @@ class BaseAgent(ABC):
         pass
     
     def _format_project_state(self, project_state: Dict[str, Any]) -> str:
-        """Format project state as a structured prompt."""
-        sections = []
-        
-        if "project" in project_state:
-            p = project_state["project"]
-            sections.append(f"PROJECT: {p.get('name', 'Unknown')}")
-            sections.append(f"Target End Date: {p.get('target_end_date', 'Not set')}")
-        
-        if "tasks" in project_state:
-            sections.append("\nTASKS:")
-            for t in project_state["tasks"]:
-                status = t.get("status", "unknown")
-                due = t.get("due_date", "no due date")
-                assignee = t.get("assignee_id", "unassigned")
-                deps = ", ".join(t.get("dependencies", [])) or "none"
-                sections.append(
-                    f"  - [{status}] {t.get('title')} | Due: {due} | Assignee: {assignee} | Deps: {deps}"
-                )
-        
-        if "milestones" in project_state:
-            sections.append("\nMILESTONES:")
-            for m in project_state["milestones"]:
-                status = "✓" if m.get("is_completed") else "○"
-                sections.append(f"  {status} {m.get('title')} | Target: {m.get('target_date', 'Not set')}")
-        
-        if "risks" in project_state:
-            sections.append("\nACTIVE RISKS:")
-            for r in project_state["risks"]:
-                if not r.get("is_resolved"):
-                    sections.append(f"  - [{r.get('level', 'unknown')}] {r.get('title')}")
+        """
+        Format project state as a structured prompt.
         
-        if "recent_events" in project_state:
-            sections.append("\nRECENT EVENTS (last 24h):")
-            for e in project_state["recent_events"][:10]:
-                sections.append(f"  - {e.get('event_type')}: {e.get('entity_type')} | {e.get('details', {})}")
+        Uses the PromptContext the orchestrator attached to the state, so the
+        state is formatted once per analysis rather than once per agent.
+        """
+        context = project_state.get("prompt_context")
+        if context is None:
+            with span("format_state"):
+                context = PromptContext.build(project_state, alias_ids=False)
+        return context.text
+    
+    def _build_prompt(self, project_state: Dict[str, Any], instructions: str) -> str:
+        """
+        Assemble the user prompt with the stable part first.
         
-        return "\n".join(sections)
+        Providers cache repeated prompt prefixes, so the canonically ordered
+        project state goes first (right after the system prompt) and the
+        volatile parts - today's date and the per-call instructions - last.
+        """
+        return (
+            f"{self._format_project_state(project_state)}\n\n"
+            f"Today's date: {project_state.get('current_date', 'Unknown')}\n\n"
+            f"{instructions}"
+        )
     
-    def _parse_recommendations(self, raw_text: str) -> list[AgentRecommendation]:
-        """Parse LLM output into structured recommendations."""
-        recommendations = []
+    def _parse_response(self, raw_text: str) -> Tuple[str, List[str], List[AgentRecommendation]]:
+        """
+        Parse an LLM response into (status summary, risks, recommendations)
+        in a single pass.
         
-        # Split by empty lines or "---" if present, otherwise process line by line
-        lines = raw_text.split("\n")
-        current_rec = None
+        Tolerates markdown bullets and numbering, headings, bold/italic
+        markers and any casing of the field names in RESPONSE_KEYS. Under
+        RISKS only bulleted or numbered lines are taken as risks.
+        """
+        status_summary = ""
+        risks: List[str] = []
+        recommendations: List[Dict[str, Any]] = []
+        section = None
+        current: Optional[Dict[str, Any]] = None
+        last_field = None
         
-        for line in lines:
-            line = line.strip()
-            if not line:
+        for line in raw_text.split("\n"):
+            text = line.strip()
+            if not text:
                 continue
-                
-            if line.startswith("TITLE:") or line.startswith("- TITLE:"):
-                if current_rec:
-                    recommendations.append(current_rec)
-                current_rec = AgentRecommendation(
-                    title=line.replace("TITLE:", "").replace("- ", "").strip(),
-                    priority="medium",
-                    category="risk",  # Default
-                    suggestion="",
-                    reasoning="",
-                    affected_entities=[],
-                )
-            elif current_rec:
-                if line.startswith("PRIORITY:"):
-                    priority = line.replace("PRIORITY:", "").strip().lower()
-                    if priority in ["low", "medium", "high", "critical"]:
-                        current_rec.priority = priority
-                elif line.startswith("CATEGORY:"):
-                    current_rec.category = line.replace("CATEGORY:", "").strip().lower()
-                elif line.startswith("SUGGESTION:"):
-                    current_rec.suggestion = line.replace("SUGGESTION:", "").strip()
-                elif line.startswith("REASON:") or line.startswith("REASONING:"):
-                    current_rec.reasoning = line.split(":", 1)[1].strip()
-                elif line.startswith("AFFECTS:"):
-                    entities = line.replace("AFFECTS:", "").strip()
-                    current_rec.affected_entities = [e.strip() for e in entities.split(",")]
-        
-        if current_rec:
-            recommendations.append(current_rec)
+            listed = False
+            if text[0] in BULLET_CHARS:
+                marker = BULLET_RE.match(text)
+                listed = marker.group(1) is not None
+                text = text[marker.end():]
+            if "**" in text or "__" in text or "`" in text:
+                text = MARKUP_RE.sub("", text)
+            
+            # "KEY: value", or a bare "KEY" heading
+            head, colon, rest = text.partition(":")
+            key = RESPONSE_KEYS.get(head.strip("*_ ").lower())
+            value = rest.lstrip("*_").strip() if key and colon else text
+            if key and not colon:
+                value = ""
             
-        return recommendations
+            if key == "status":
+                status_summary = status_summary or value
+                section, last_field = None, None
+            elif key == "risks":
+                section, last_field = "risks", None
+                if value:
+                    risks.append(value)
+            elif key == "recommendations":
+                section, last_field = "recommendations", None
+            elif key == "title":
+                section, last_field = "recommendations", None
+                current = {
+                    "title": value,
+                    "priority": "medium",
+                    "category": "risk",  # Default
+                    "suggestion": "",
+                    "reasoning": "",
+                    "affected_entities": [],
+                }
+                recommendations.append(current)
+            elif key is not None:
+                if current is None or section != "recommendations":
+                    # A stray field (e.g. ACTION: under RISKS) ends the list
+                    section, last_field = None, None
+                    continue
+                last_field = key
+                if key == "priority":
+                    priority = PRIORITY_RE.search(value.lower())
+                    if priority:
+                        current["priority"] = priority.group(1)
+                elif key == "category":
+                    current["category"] = value.strip("[]").strip().lower()
+                elif key == "affected_entities":
+                    current["affected_entities"] = [
+                        e.strip() for e in value.strip("[]").split(",")
+                        if e.strip() and e.strip().lower() not in ("none", "n/a")
+                    ]
+                else:
+                    current[key] = value
+            elif section == "risks":
+                # Only list items are risks; prose after the list is not
+                if listed:
+                    risks.append(value)
+            elif current is not None and last_field in ("suggestion", "reasoning"):
+                # Wrapped continuation of a multi-line field
+                current[last_field] = f"{current[last_field]} {value}".strip()
+        
+        return status_summary, risks, [AgentRecommendation(**rec) for rec in recommendations]
+    
+    def _build_output(self, raw_text: str, default_summary: str) -> AgentOutput:
+        """Parse a response into this agent's AgentOutput."""
+        with span("parse", agent=self.name):
+            status_summary, risks, recommendations = self._parse_response(raw_text)
+        return AgentOutput(
+            agent_name=self.name,
+            status_summary=status_summary or default_summary,
+            risks=risks,
+            recommendations=recommendations,
+        )
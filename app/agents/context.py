@@ -0,0 +1,160 @@
+"""
+Prompt Context - Project state formatted once per analysis and shared by all agents.
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+from app.agents.snapshot import TaskTable
+from app.models import AgentOutput
+
+HANDLE_RE = re.compile(r"[TXMR]\d+\b")
+# A handle in prose, with the title the model may have written after it
+TEXT_HANDLE_RE = re.compile(r"\b([TXMR]\d+)\b(?: \(([^()\n]*)\))?")
+
+
+def format_rollup(day: Dict[str, Any]) -> str:
+    """Format one daily rollup as a compact prompt line."""
+    counts = day.get("counts", {})
+    line = " | ".join(
+        f"{metric} {counts.get(metric, 0)}"
+        for metric in ("created", "completed", "blocked", "updated")
+    )
+    
+    completers = sorted(
+        (
+            (assignee, metrics.get("completed", 0))
+            for assignee, metrics in day.get("by_assignee", {}).items()
+        ),
+        key=lambda item: (-item[1], item[0]),
+    )
+    completers = [f"{a} ({n})" for a, n in completers if n][:3]
+    if completers:
+        line += f" | completed by: {', '.join(completers)}"
+    
+    return f"{day.get('date')}: {line}"
+
+
+class PromptContext:
+    """
+    The formatted project state section of every agent prompt.
+    
+    Built once by the orchestrator and handed to every agent, so a full
+    analysis formats the state once instead of once per prompt. With
+    aliasing on, tasks, milestones and risks are written as short handles
+    (T1, M1, R1; X1 for dependencies outside the project) instead of
+    24-character ObjectIds, and resolve() maps handles in an agent's
+    affected_entities back to the real IDs; resolve_text() does the same
+    for free text such as the executive report.
+    """
+    
+    __slots__ = ("text", "aliases", "titles")
+    
+    def __init__(
+        self,
+        text: str,
+        aliases: Optional[Dict[str, str]] = None,
+        titles: Optional[Dict[str, str]] = None,
+    ):
+        self.text = text
+        self.aliases = aliases or {}
+        self.titles = titles or {}
+    
+    @classmethod
+    def build(cls, project_state: Dict[str, Any], alias_ids: bool = True) -> "PromptContext":
+        """Format a project state (as loaded by get_project_state)."""
+        sections = []
+        aliases: Dict[str, str] = {}
+        titles: Dict[str, str] = {}
+        
+        def handle(prefix: str, number: int, entity_id: Any, title: Optional[str] = None) -> str:
+            name = f"{prefix}{number}"
+            aliases[name] = str(entity_id)
+            if title:
+                titles[name] = title
+            return name
+        
+        if "project" in project_state:
+            p = project_state["project"]
+            sections.append(f"PROJECT: {p.get('name', 'Unknown')}")
+            sections.append(f"Target End Date: {p.get('target_end_date', 'Not set')}")
+        
+        if "tasks" in project_state:
+            sections.append("\nTASKS:")
+            tasks = project_state["tasks"]
+            if not isinstance(tasks, TaskTable):
+                tasks = TaskTable.from_documents(tasks)
+            if alias_ids:
+                sections.extend(tasks.format_lines(
+                    [
+                        handle("T", i, task_id, title)
+                        for i, (task_id, title) in enumerate(zip(tasks.ids, tasks.titles), 1)
+                    ],
+                    [handle("X", i, task_id) for i, task_id in enumerate(tasks.external_ids, 1)],
+                ))
+            else:
+                sections.extend(tasks.format_lines())
+        
+        if "milestones" in project_state:
+            sections.append("\nMILESTONES:")
+            for i, m in enumerate(project_state["milestones"], 1):
+                status = "✓" if m.get("is_completed") else "○"
+                prefix = f"{handle('M', i, m.get('_id'), m.get('title'))} " if alias_ids else ""
+                sections.append(f"  {status} {prefix}{m.get('title')} | Target: {m.get('target_date', 'Not set')}")
+        
+        if "risks" in project_state:
+            sections.append("\nACTIVE RISKS:")
+            for i, r in enumerate(project_state["risks"], 1):
+                if not r.get("is_resolved"):
+                    prefix = f"{handle('R', i, r.get('_id'), r.get('title'))} " if alias_ids else ""
+                    sections.append(f"  - {prefix}[{r.get('level', 'unknown')}] {r.get('title')}")
+        
+        if project_state.get("velocity"):
+            sections.append("\nDAILY VELOCITY (one line per active day, oldest first):")
+            for day in project_state["velocity"]:
+                sections.append(f"  - {format_rollup(day)}")
+        elif "recent_events" in project_state:
+            sections.append("\nRECENT EVENTS (last 24h):")
+            for e in project_state["recent_events"][:10]:
+                sections.append(f"  - {e.get('event_type')}: {e.get('entity_type')} | {e.get('details', {})}")
+        
+        return cls("\n".join(sections), aliases, titles)
+    
+    def resolve(self, entities: List[str]) -> List[str]:
+        """Map handles (e.g. "T12" or "T12 (Login page)") back to entity IDs."""
+        resolved = []
+        for entity in entities:
+            match = HANDLE_RE.match(entity)
+            if match and match.group(0) in self.aliases:
+                resolved.append(self.aliases[match.group(0)])
+            else:
+                resolved.append(entity)
+        return resolved
+    
+    def resolve_text(self, text: str) -> str:
+        """
+        Replace handles in free text with what they stand for: the title and
+        ID ("Login page (6650...)"), or the ID alone for untitled entities.
+        """
+        if not self.aliases:
+            return text
+        
+        def replace(match: "re.Match") -> str:
+            name, written = match.group(1), match.group(2)
+            entity_id = self.aliases.get(name)
+            if entity_id is None:
+                return match.group(0)
+            title = self.titles.get(name)
+            resolved = f"{title} ({entity_id})" if title else entity_id
+            # Drop a parenthesised title the model repeated; keep anything else
+            if written is not None and written.strip().lower() != (title or "").lower():
+                resolved += f" ({written})"
+            return resolved
+        
+        return TEXT_HANDLE_RE.sub(replace, text)
+    
+    def resolve_output(self, output: AgentOutput) -> AgentOutput:
+        """Resolve affected_entities of every recommendation in place."""
+        if self.aliases:
+            for rec in output.recommendations:
+                rec.affected_entities = self.resolve(rec.affected_entities)
+        return output
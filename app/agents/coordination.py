@@ -14,6 +14,13 @@ class CoordinationAgent(BaseAgent):
     - Suggests communication actions
     """
     
+    # Task flow and recent activity; the risk register is the Risk Agent's job
+    required_fields = {
+        key: fields
+        for key, fields in BaseAgent.required_fields.items()
+        if key != "risks"
+    }
+    
     def __init__(self):
         super().__init__("CoordinationAgent")
     
@@ -37,11 +44,7 @@ Be concise and punchy. Match the 'Immediate Attention' UI style."""
     
     async def analyze(self, project_state: Dict[str, Any]) -> AgentOutput:
         """Analyze project coordination and task flow."""
-        prompt = f"""Analyze this project's coordination state:
-
-{self._format_project_state(project_state)}
-
-Today's date: {project_state.get('current_date', 'Unknown')}
+        prompt = self._build_prompt(project_state, """Analyze this project's coordination state above.
 
 Evaluate:
 1. Are there tasks in_progress for too long without updates?
@@ -51,36 +54,13 @@ Evaluate:
 
 Identify stalled work and suggest communication actions to improve flow.
 
-Provide your analysis in the specified format."""
+Provide your analysis in the specified format.""")
 
         response = await self.llm.structured_output(
             prompt=prompt,
             system_prompt=self.system_prompt,
             temperature=0.3,
+            agent=self.name,
         )
         
-        # Parse response
-        lines = response.split("\n")
-        status_summary = ""
-        risks = []
-        in_risks = False
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith("STATUS:"):
-                status_summary = line.replace("STATUS:", "").strip()
-            elif line == "RISKS:" or line == "RISKS":
-                in_risks = True
-            elif line.startswith("RECOMMENDATIONS:") or line.startswith("ACTION:"):
-                in_risks = False
-            elif in_risks and line.startswith("-"):
-                risks.append(line[1:].strip())
-        
-        recommendations = self._parse_recommendations(response)
-        
-        return AgentOutput(
-            agent_name=self.name,
-            status_summary=status_summary or "Coordination analysis complete",
-            risks=risks,
-            recommendations=recommendations,
-        )
+        return self._build_output(response, "Coordination analysis complete")
@@ -0,0 +1,261 @@
+"""
+Delta Prompting - Re-analyze only what changed since an agent's last run.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import DocumentTooLarge
+
+from app.agents.context import PromptContext
+from app.agents.snapshot import TaskTable, NO_DATE, EPOCH
+from app.core.config import get_settings
+from app.models import AgentOutput
+
+settings = get_settings()
+
+
+def snapshot_tasks(tasks: TaskTable) -> Dict[str, list]:
+    """Compact, BSON-friendly copy of the task fields the diff compares."""
+    return {
+        "ids": list(tasks.ids),
+        "status": [tasks.status(row) for row in range(len(tasks))],
+        "due": [None if micros == NO_DATE else micros for micros in tasks.due_dates],
+        "assignee": [tasks.assignee(row) for row in range(len(tasks))],
+    }
+
+
+class TaskDiff:
+    """Task changes between a stored snapshot and the current TaskTable."""
+    
+    __slots__ = ("added", "removed", "status_changes", "due_changes", "reassigned")
+    
+    def __init__(self, previous: Dict[str, list], tasks: TaskTable):
+        before = {
+            task_id: (status, due, assignee)
+            for task_id, status, due, assignee in zip(
+                previous["ids"], previous["status"], previous["due"], previous["assignee"]
+            )
+        }
+        self.added: List[int] = []
+        self.status_changes: List[tuple] = []
+        self.due_changes: List[tuple] = []
+        self.reassigned: List[tuple] = []
+        
+        for row, task_id in enumerate(tasks.ids):
+            old = before.pop(task_id, None)
+            if old is None:
+                self.added.append(row)
+                continue
+            old_status, old_due, old_assignee = old
+            status = tasks.status(row)
+            if status != old_status:
+                self.status_changes.append((row, old_status, status))
+            due = tasks.due_dates[row]
+            due = None if due == NO_DATE else due
+            if due != old_due:
+                self.due_changes.append((row, old_due, due))
+            assignee = tasks.assignee(row)
+            if assignee != old_assignee:
+                self.reassigned.append((row, old_assignee, assignee))
+        
+        self.removed = len(before)
+    
+    def __len__(self) -> int:
+        return (
+            len(self.added) + self.removed + len(self.status_changes)
+            + len(self.due_changes) + len(self.reassigned)
+        )
+
+
+def _date(micros: Optional[int]) -> str:
+    return "none" if micros is None else (EPOCH + timedelta(microseconds=micros)).date().isoformat()
+
+
+def format_delta(
+    project_state: Dict[str, Any],
+    context: PromptContext,
+    previous: AgentOutput,
+    diff: TaskDiff,
+) -> PromptContext:
+    """
+    Prompt context with the agent's previous analysis and the task changes
+    since, in place of the full task list. Uses the same handles as
+    `context`, so affected_entities resolve the same way.
+    """
+    tasks: TaskTable = project_state["tasks"]
+    handle_of = {entity_id: handle for handle, entity_id in context.aliases.items()}
+    handles = [handle_of.get(task_id, task_id) for task_id in tasks.ids]
+    external_handles = [handle_of.get(task_id, task_id) for task_id in tasks.external_ids]
+    
+    def label(row: int) -> str:
+        return f"{handles[row]} {tasks.titles[row]}"
+    
+    p = project_state.get("project", {})
+    totals = ", ".join(f"{status} {count}" for status, count in tasks.status_counts().items())
+    sections = [
+        f"PROJECT: {p.get('name', 'Unknown')}",
+        f"Target End Date: {p.get('target_end_date', 'Not set')}",
+        f"TASK TOTALS: {len(tasks)} tasks | {totals or 'none'}",
+        f"\nPREVIOUS ANALYSIS ({previous.generated_at.strftime('%Y-%m-%d %H:%M')} UTC):",
+        f"STATUS: {previous.status_summary}",
+    ]
+    if previous.risks:
+        sections.append("RISKS:")
+        sections.extend(f"  - {risk}" for risk in previous.risks)
+    if previous.recommendations:
+        sections.append("RECOMMENDATIONS:")
+        for rec in previous.recommendations:
+            affects = ", ".join(handle_of.get(e, e) for e in rec.affected_entities) or "none"
+            sections.append(f"  - [{rec.priority}] {rec.title} | Affects: {affects}")
+    
+    sections.append(
+        f"\nCHANGES SINCE PREVIOUS ANALYSIS ({len(diff)}) - update the previous"
+        " analysis for these, keeping findings that still hold:"
+    )
+    if diff.added:
+        sections.append("New tasks:")
+        sections.extend(tasks.format_lines(handles, external_handles, diff.added))
+    for row, old, new in diff.status_changes:
+        flag = " (NEWLY BLOCKED)" if new == "blocked" else ""
+        sections.append(f"  ~ {label(row)}: status {old} -> {new}{flag}")
+    for row, old, new in diff.due_changes:
+        slipped = old is not None and (new is None or new > old)
+        sections.append(
+            f"  ~ {label(row)}: due {_date(old)} -> {_date(new)}{' (SLIPPED)' if slipped else ''}"
+        )
+    for row, old, new in diff.reassigned:
+        sections.append(f"  ~ {label(row)}: assignee {old or 'unassigned'} -> {new or 'unassigned'}")
+    if diff.removed:
+        sections.append(f"  - {diff.removed} task(s) deleted")
+    if not len(diff):
+        sections.append("  (no task changes)")
+    
+    # Milestones, risks and activity are small and not covered by the task
+    # diff; send them in full (milestones and risks keep the same handles)
+    rest = {
+        key: project_state[key]
+        for key in ("milestones", "risks", "velocity", "recent_events")
+        if key in project_state
+    }
+    if rest:
+        sections.append(PromptContext.build(rest).text)
+    
+    return PromptContext("\n".join(sections), context.aliases, context.titles)
+
+
+async def load_runs(
+    db: AsyncIOMotorDatabase,
+    project_id: str,
+    agent_names: Iterable[str],
+) -> Dict[str, dict]:
+    """
+    Fetch the stored base runs (last full analyses) of the given agents,
+    keyed by agent name, each with the task snapshot it references under
+    "snapshot". Bases older than DELTA_MAX_AGE_HOURS are skipped.
+    """
+    if settings.delta_max_changes <= 0:
+        return {}
+    
+    cutoff = datetime.utcnow() - timedelta(hours=settings.delta_max_age_hours)
+    runs = {}
+    async for doc in db.agent_runs.find({
+        "_id": {"$in": [f"{project_id}:{name}" for name in agent_names]},
+        "run_at": {"$gte": cutoff},
+    }):
+        runs[doc["agent"]] = doc
+    
+    snapshot_ids = list({run["snapshot_id"] for run in runs.values() if run.get("snapshot_id")})
+    if snapshot_ids:
+        snapshots = {
+            doc["_id"]: doc["tasks"]
+            async for doc in db.agent_snapshots.find({"_id": {"$in": snapshot_ids}})
+        }
+        for run in runs.values():
+            run["snapshot"] = snapshots.get(run.get("snapshot_id"))
+    return runs
+
+
+def delta_context(
+    project_state: Dict[str, Any],
+    context: PromptContext,
+    run: Optional[dict],
+) -> Optional[PromptContext]:
+    """
+    Delta prompt context for an agent, or None when a full analysis is due.
+    Changes are counted against the base run, so they accumulate across
+    delta runs until DELTA_MAX_CHANGES forces a new full analysis.
+    """
+    tasks = project_state.get("tasks")
+    if not run or not run.get("snapshot") or not isinstance(tasks, TaskTable):
+        return None
+    
+    diff = TaskDiff(run["snapshot"], tasks)
+    if len(diff) > settings.delta_max_changes:
+        return None
+    return format_delta(project_state, context, AgentOutput(**run["output"]), diff)
+
+
+async def save_runs(
+    db: AsyncIOMotorDatabase,
+    project_id: str,
+    outputs: Dict[str, AgentOutput],
+    tasks: Any,
+) -> None:
+    """
+    Store each agent's full-analysis output as its delta base, referencing
+    one task snapshot shared by all agents of this run (agent_snapshots),
+    and drop snapshots no run uses. Delta outputs are not stored, so the
+    base (and its age) only moves forward on a full analysis.
+    """
+    outputs = {name: output for name, output in outputs.items() if output.analysis_mode == "full"}
+    if settings.delta_max_changes <= 0 or not outputs or not isinstance(tasks, TaskTable):
+        return
+    
+    now = datetime.utcnow()
+    snapshot_id = f"{project_id}:{ObjectId()}"
+    try:
+        await db.agent_snapshots.insert_one({
+            "_id": snapshot_id,
+            "project_id": project_id,
+            "tasks": snapshot_tasks(tasks),
+            "created_at": now,
+        })
+        await db.agent_runs.bulk_write([
+            UpdateOne(
+                {"_id": f"{project_id}:{name}"},
+                {
+                    "$set": {
+                        "project_id": project_id,
+                        "agent": name,
+                        "output": output.model_dump(),
+                        "snapshot_id": snapshot_id,
+                        "run_at": now,
+                    },
+                    "$unset": {"snapshot": ""},
+                },
+                upsert=True,
+            )
+            for name, output in outputs.items()
+        ], ordered=False)
+        
+        # Snapshots created after `now` belong to concurrent runs still saving
+        in_use = [
+            doc.get("snapshot_id")
+            async for doc in db.agent_runs.find({"project_id": project_id}, {"snapshot_id": 1})
+        ]
+        await db.agent_snapshots.delete_many({
+            "project_id": project_id,
+            "_id": {"$nin": in_use},
+            "created_at": {"$lte": now},
+        })
+    except DocumentTooLarge:
+        print(
+            f"Task snapshot for {project_id} ({len(tasks)} tasks) exceeds the BSON "
+            "document limit; delta analysis is unavailable for this project"
+        )
+    except Exception as e:
+        # Losing a run only costs a full analysis next time
+        print(f"Failed to store agent runs for {project_id}: {e}")
@@ -1,13 +1,19 @@
 """
 Agent Orchestrator - Coordinates all agents for comprehensive project analysis.
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterable, Optional
 from datetime import datetime
 
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.agents.context import PromptContext
+from app.agents.delta import load_runs, delta_context, save_runs
 from app.agents.planning import PlanningAgent
 from app.agents.coordination import CoordinationAgent
 from app.agents.risk import RiskAgent
 from app.agents.reporting import ReportingAgent
+from app.agents.base import BaseAgent
+from app.core.tracing import span
 from app.models import AgentOutput
 
 
@@ -22,29 +28,117 @@ class AgentOrchestrator:
         self.coordination_agent = CoordinationAgent()
         self.risk_agent = RiskAgent()
         self.reporting_agent = ReportingAgent()
+        self.agents = {
+            "planning": self.planning_agent,
+            "coordination": self.coordination_agent,
+            "risk": self.risk_agent,
+            "reporting": self.reporting_agent,
+        }
+    
+    def required_fields(self, agent_names: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+        """
+        Union of the state fields read by the given agents (all by default).
+        
+        Returns a mapping of project state section to field names; sections
+        no agent reads are omitted so the loader can skip them entirely.
+        PromptContext renders every loaded section, so runs that should share
+        a prompt prefix (a single agent and the full analysis) must load the
+        same union.
+        """
+        names = agent_names if agent_names is not None else self.agents.keys()
+        fields: Dict[str, set] = {}
+        for name in names:
+            agent = self.agents.get(name.lower())
+            if not agent:
+                raise ValueError(f"Unknown agent: {name}")
+            for section, section_fields in agent.required_fields.items():
+                fields.setdefault(section, set()).update(section_fields)
+        return {section: sorted(values) for section, values in fields.items()}
+    
+    @staticmethod
+    def _attach_context(project_state: Dict[str, Any]) -> PromptContext:
+        """Format the state once and share it with every agent in this run."""
+        with span("format_state"):
+            context = PromptContext.build(project_state)
+        project_state["prompt_context"] = context
+        return context
+    
+    async def _agent_states(
+        self,
+        agent_names: List[str],
+        project_state: Dict[str, Any],
+        context: PromptContext,
+        db: Optional[AsyncIOMotorDatabase],
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Project state to hand each agent.
+        
+        Agents with a recent stored run whose task diff is small get a copy
+        of the state whose prompt context holds only their previous output
+        and the changes since; the rest get the full state.
+        """
+        states = {name: project_state for name in agent_names}
+        if db is None:
+            return states
+        
+        runs = await load_runs(db, str(project_state["project"]["_id"]), agent_names)
+        for name in agent_names:
+            delta = delta_context(project_state, context, runs.get(name))
+            if delta is not None:
+                states[name] = {**project_state, "prompt_context": delta, "analysis_mode": "delta"}
+        return states
     
-    async def run_full_analysis(self, project_state: Dict[str, Any]) -> Dict[str, AgentOutput]:
+    @staticmethod
+    async def _analyze(agent: BaseAgent, state: Dict[str, Any]) -> AgentOutput:
+        """Run one agent inside its own trace span."""
+        with span(f"agent.{agent.name}", analysis_mode=state.get("analysis_mode", "full")):
+            return await agent.analyze(state)
+    
+    @staticmethod
+    def _finish(
+        context: PromptContext,
+        state: Dict[str, Any],
+        output: AgentOutput,
+    ) -> AgentOutput:
+        """Resolve handles and record whether the output came from a delta."""
+        output.analysis_mode = state.get("analysis_mode", "full")
+        return context.resolve_output(output)
+    
+    async def run_full_analysis(
+        self,
+        project_state: Dict[str, Any],
+        db: Optional[AsyncIOMotorDatabase] = None,
+    ) -> Dict[str, AgentOutput]:
         """
         Run all agents and return comprehensive analysis.
         
         Args:
             project_state: Current project state from database
+            db: When given, agents re-analyze only what changed since their
+                stored last run (if small enough) and the new runs are stored
             
         Returns:
             Dict mapping agent names to their outputs
         """
-        # Add current date to project state
-        project_state["current_date"] = datetime.utcnow().isoformat()
+        # Add current date to project state (day granularity keeps prompts
+        # byte-identical across runs within a day)
+        project_state["current_date"] = datetime.utcnow().date().isoformat()
+        context = self._attach_context(project_state)
+        states = await self._agent_states(list(self.agents), project_state, context, db)
         
         # Run analysis agents (could be parallelized with asyncio.gather for scale)
         import asyncio
         
         planning_output, coordination_output, risk_output = await asyncio.gather(
-            self.planning_agent.analyze(project_state),
-            self.coordination_agent.analyze(project_state),
-            self.risk_agent.analyze(project_state),
+            self._analyze(self.planning_agent, states["planning"]),
+            self._analyze(self.coordination_agent, states["coordination"]),
+            self._analyze(self.risk_agent, states["risk"]),
         )
         
+        self._finish(context, states["planning"], planning_output)
+        self._finish(context, states["coordination"], coordination_output)
+        self._finish(context, states["risk"], risk_output)
+        
         # Consolidation for the dashboard's "AI Insights" panel
         all_recs = (
             planning_output.recommendations + 
@@ -57,7 +151,19 @@ class AgentOrchestrator:
         all_recs.sort(key=lambda x: priority_map.get(x.priority.lower(), 10))
         
         # Reporting agent runs after to include other agents' insights
-        reporting_output = await self.reporting_agent.analyze(project_state)
+        reporting_output = self._finish(
+            context,
+            states["reporting"],
+            await self._analyze(self.reporting_agent, states["reporting"]),
+        )
+        
+        if db is not None:
+            await save_runs(db, str(project_state["project"]["_id"]), {
+                "planning": planning_output,
+                "coordination": coordination_output,
+                "risk": risk_output,
+                "reporting": reporting_output,
+            }, project_state.get("tasks"))
         
         return {
             "planning": planning_output,
@@ -71,29 +177,31 @@ class AgentOrchestrator:
         self,
         agent_name: str,
         project_state: Dict[str, Any],
+        db: Optional[AsyncIOMotorDatabase] = None,
     ) -> AgentOutput:
-        """Run a specific agent."""
-        project_state["current_date"] = datetime.utcnow().isoformat()
+        """Run a specific agent (see run_full_analysis for `db`)."""
+        project_state["current_date"] = datetime.utcnow().date().isoformat()
         
-        agents = {
-            "planning": self.planning_agent,
-            "coordination": self.coordination_agent,
-            "risk": self.risk_agent,
-            "reporting": self.reporting_agent,
-        }
-        
-        agent = agents.get(agent_name.lower())
+        agent = self.agents.get(agent_name.lower())
         if not agent:
             raise ValueError(f"Unknown agent: {agent_name}")
         
-        return await agent.analyze(project_state)
+        name = agent_name.lower()
+        context = self._attach_context(project_state)
+        state = (await self._agent_states([name], project_state, context, db))[name]
+        output = self._finish(context, state, await self._analyze(agent, state))
+        
+        if db is not None:
+            await save_runs(db, str(project_state["project"]["_id"]), {name: output}, project_state.get("tasks"))
+        return output
     
     async def generate_executive_report(
         self,
         project_state: Dict[str, Any],
     ) -> str:
         """Generate comprehensive executive report using all agents."""
-        project_state["current_date"] = datetime.utcnow().isoformat()
+        project_state["current_date"] = datetime.utcnow().date().isoformat()
+        context = self._attach_context(project_state)
         
         # Run all analysis agents first
         import asyncio
@@ -104,11 +212,12 @@ class AgentOrchestrator:
             self.risk_agent.analyze(project_state),
         )
         
-        # Generate comprehensive report
-        return await self.reporting_agent.generate_full_report(
+        # Generate comprehensive report, with handles mapped back to entities
+        report = await self.reporting_agent.generate_full_report(
             project_state=project_state,
             other_agent_outputs=[planning_output, coordination_output, risk_output],
         )
+        return context.resolve_text(report)
 
 
 # Singleton instance
@@ -14,6 +14,13 @@ class PlanningAgent(BaseAgent):
     - Does NOT define implementation details
     """
     
+    # Sequencing and timelines only need structure, not risks or activity
+    required_fields = {
+        key: fields
+        for key, fields in BaseAgent.required_fields.items()
+        if key in ("project", "tasks", "milestones")
+    }
+    
     def __init__(self):
         super().__init__("PlanningAgent")
     
@@ -39,17 +46,13 @@ PRIORITY: high
 CATEGORY: planning
 SUGGESTION: Link 'Frontend Setup' to 'Backend Integration'
 REASON: Tasks are being worked on in parallel without clear handoffs, risking integration failure.
-AFFECTS: task_123, task_456
+AFFECTS: T3, T7
 
 Be concise, punchy, and actionable. Match the 'Immediate Attention' style."""
     
     async def analyze(self, project_state: Dict[str, Any]) -> AgentOutput:
         """Analyze project planning and sequencing."""
-        prompt = f"""Analyze this project's planning structure:
-
-{self._format_project_state(project_state)}
-
-Today's date: {project_state.get('current_date', 'Unknown')}
+        prompt = self._build_prompt(project_state, """Analyze this project's planning structure above.
 
 Evaluate:
 1. Are milestones properly sequenced?
@@ -57,36 +60,13 @@ Evaluate:
 3. Are there any orphan tasks without milestones?
 4. Are timelines realistic given dependencies?
 
-Provide your analysis in the specified format."""
+Provide your analysis in the specified format.""")
 
         response = await self.llm.structured_output(
             prompt=prompt,
             system_prompt=self.system_prompt,
             temperature=0.3,
+            agent=self.name,
         )
         
-        # Parse response into structured output
-        lines = response.split("\n")
-        status_summary = ""
-        risks = []
-        in_risks = False
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith("STATUS:"):
-                status_summary = line.replace("STATUS:", "").strip()
-            elif line == "RISKS:" or line == "RISKS":
-                in_risks = True
-            elif line.startswith("RECOMMENDATIONS:") or line.startswith("ACTION:"):
-                in_risks = False
-            elif in_risks and line.startswith("-"):
-                risks.append(line[1:].strip())
-        
-        recommendations = self._parse_recommendations(response)
-        
-        return AgentOutput(
-            agent_name=self.name,
-            status_summary=status_summary or "Planning analysis complete",
-            risks=risks,
-            recommendations=recommendations,
-        )
+        return self._build_output(response, "Planning analysis complete")
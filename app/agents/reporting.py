@@ -35,43 +35,18 @@ Be extremely concise and operational."""
     
     async def analyze(self, project_state: Dict[str, Any]) -> AgentOutput:
         """Generate stakeholder summary."""
-        prompt = f"""Generate a stakeholder summary for this project:
+        prompt = self._build_prompt(project_state, """Generate a stakeholder summary for the project above.
 
-{self._format_project_state(project_state)}
-
-Today's date: {project_state.get('current_date', 'Unknown')}
-
-Create a clear, concise summary in the specified format."""
+Create a clear, concise summary in the specified format.""")
 
         response = await self.llm.structured_output(
             prompt=prompt,
             system_prompt=self.system_prompt,
             temperature=0.4,
+            agent=self.name,
         )
         
-        # Parse response
-        status_summary = ""
-        risks = []
-        lines = response.split("\n")
-        in_risks = False
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith("STATUS:"):
-                status_summary = line.replace("STATUS:", "").strip()
-            elif line == "RISKS:":
-                in_risks = True
-            elif line.startswith("TITLE:"):
-                in_risks = False
-            elif in_risks and line.startswith("-"):
-                risks.append(line[1:].strip())
-        
-        return AgentOutput(
-            agent_name=self.name,
-            status_summary=status_summary or "Report generated",
-            risks=risks,
-            recommendations=self._parse_recommendations(response),
-        )
+        return self._build_output(response, "Report generated")
     
     async def generate_full_report(
         self,
@@ -92,16 +67,16 @@ Create a clear, concise summary in the specified format."""
             for rec in all_recommendations[:8]:
                 aggregated_context += f"  - [{rec.priority}] {rec.title}: {rec.suggestion}\n"
         
-        prompt = f"""Generate an executive stakeholder report:
-
-{self._format_project_state(project_state)}
-
-{aggregated_context}
-
-Today's date: {project_state.get('current_date', 'Unknown')}"""
+        # Other agents' insights change every run, so they follow the state
+        prompt = self._build_prompt(
+            project_state,
+            f"""{aggregated_context}
+Generate an executive stakeholder report for the project above.""",
+        )
 
         return await self.llm.structured_output(
             prompt=prompt,
             system_prompt=self.system_prompt,
             temperature=0.4,
+            agent=self.name,
         )
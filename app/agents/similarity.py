@@ -0,0 +1,177 @@
+"""
+Similarity Cache - Reuse ticket splits for near-duplicate topics.
+Topics are embedded locally as hashed character n-gram vectors (no external
+embedding service) and matched with an inverted-index nearest-neighbour search.
+Trigram similarity alone ignores word order and barely separates "Enable X"
+from "Disable X" or "Postgres 15" from "Postgres 16", so topics must also
+have the same content words in the same order (see content_words); the
+fuzzy match mainly applies to the context.
+"""
+import math
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Words that say little about what the work is ("Add X" vs "X integration")
+STOP_WORDS = frozenset({
+    "a", "an", "the", "for", "to", "of", "and", "with", "in", "on", "into",
+    "add", "adding", "implement", "create", "build", "new", "support",
+    "integrate", "integration", "feature", "setup", "set", "up",
+})
+
+NGRAM = 3
+DIMENSIONS = 1 << 14
+
+Vector = Dict[int, float]
+
+
+def _singular(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase, drop punctuation, stop words and plural "s", collapse whitespace."""
+    return " ".join(
+        _singular(w) for w in WORD_RE.findall((text or "").lower()) if w not in STOP_WORDS
+    )
+
+
+def embed(normalized: str) -> Vector:
+    """L2-normalized hashed character n-grams, taken within word boundaries."""
+    counts: Dict[int, float] = {}
+    for word in normalized.split():
+        padded = f" {word} "
+        for i in range(len(padded) - NGRAM + 1):
+            bucket = zlib.crc32(padded[i:i + NGRAM].encode()) & (DIMENSIONS - 1)
+            counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    return {k: v / norm for k, v in counts.items()} if norm else {}
+
+
+def content_words(normalized: str) -> Tuple[str, ...]:
+    """The words of a normalized text, in order."""
+    return tuple(normalized.split())
+
+
+def numeric_tokens(normalized: str) -> Tuple[str, ...]:
+    """The words containing a digit, sorted."""
+    return tuple(sorted(w for w in normalized.split() if any(c.isdigit() for c in w)))
+
+
+def cosine(a: Vector, b: Vector) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class SimilarityCache:
+    """
+    Nearest-neighbour cache keyed on (scope, topic, context).
+    
+    A lookup hits when the closest stored topic in the same scope has
+    cosine similarity >= threshold and the same content words (see
+    content_words), and the contexts are equally similar (two empty
+    contexts count as identical) with the same numeric tokens. Topics
+    that are all stop words are never cached. Entries expire after
+    `ttl_seconds` and the least recently used are evicted beyond
+    `max_entries`.
+    """
+    
+    def __init__(self, threshold: float, max_entries: int, ttl_seconds: float):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[tuple, Vector, Vector, Any, float]]" = OrderedDict()
+        self._exact: Dict[Tuple[str, str, str], int] = {}
+        self._postings: Dict[Tuple[str, int], Set[int]] = {}
+        self._next_id = 0
+    
+    def lookup(self, scope: str, topic: str, context: Optional[str] = None) -> Optional[Tuple[Any, float]]:
+        """Return (cached value, similarity) of the nearest match, or None."""
+        if self.max_entries <= 0:
+            return None
+        
+        norm_topic, norm_context = normalize(topic), normalize(context)
+        if not norm_topic:
+            return None
+        entry_id = self._exact.get((scope, norm_topic, norm_context))
+        if entry_id is not None and self._fresh(entry_id):
+            return self._hit(entry_id, 1.0)
+        
+        query = embed(norm_topic)
+        scores: Dict[int, float] = {}
+        for bucket, weight in query.items():
+            for candidate in self._postings.get((scope, bucket), ()):
+                scores[candidate] = scores.get(candidate, 0.0) + weight * self._entries[candidate][1][bucket]
+        
+        context_vector = embed(norm_context)
+        words = (content_words(norm_topic), numeric_tokens(norm_context))
+        for candidate, score in sorted(scores.items(), key=lambda item: -item[1]):
+            if score < self.threshold:
+                break
+            if not self._fresh(candidate):
+                continue
+            _, stored_topic, stored_context_text = self._entries[candidate][0]
+            if (content_words(stored_topic), numeric_tokens(stored_context_text)) != words:
+                continue
+            stored_context = self._entries[candidate][2]
+            if context_vector or stored_context:
+                score = min(score, cosine(context_vector, stored_context))
+            if score >= self.threshold:
+                return self._hit(candidate, score)
+        
+        self.misses += 1
+        return None
+    
+    def store(self, scope: str, topic: str, context: Optional[str], value: Any) -> None:
+        """Cache a value for a topic (replacing an identical key)."""
+        if self.max_entries <= 0:
+            return
+        
+        norm_topic, norm_context = normalize(topic), normalize(context)
+        if not norm_topic:
+            return
+        key = (scope, norm_topic, norm_context)
+        if key in self._exact:
+            self._remove(self._exact[key])
+        
+        entry_id = self._next_id
+        self._next_id += 1
+        vector = embed(norm_topic)
+        self._entries[entry_id] = (key, vector, embed(norm_context), value, time.monotonic())
+        self._exact[key] = entry_id
+        for bucket in vector:
+            self._postings.setdefault((scope, bucket), set()).add(entry_id)
+        
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+    
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+    
+    def _hit(self, entry_id: int, score: float) -> Tuple[Any, float]:
+        self.hits += 1
+        self._entries.move_to_end(entry_id)
+        return self._entries[entry_id][3], score
+    
+    def _fresh(self, entry_id: int) -> bool:
+        if time.monotonic() - self._entries[entry_id][4] <= self.ttl_seconds:
+            return True
+        self._remove(entry_id)
+        return False
+    
+    def _remove(self, entry_id: int) -> None:
+        key, vector, _, _, _ = self._entries.pop(entry_id)
+        del self._exact[key]
+        scope = key[0]
+        for bucket in vector:
+            postings = self._postings[(scope, bucket)]
+            postings.discard(entry_id)
+            if not postings:
+                del self._postings[(scope, bucket)]
@@ -0,0 +1,207 @@
+"""
+Project Snapshot - Compact columnar task table shared by all agents.
+"""
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from app.models import TaskStatus
+
+EPOCH = datetime(1970, 1, 1)
+NO_DATE = -(2 ** 63)
+NO_ASSIGNEE = -1
+
+
+class TaskTable:
+    """
+    Array-backed table of the task fields agents read.
+    
+    Statuses and assignees are interned into small integer codes, due dates
+    are stored as integer microseconds since the epoch, and dependencies
+    use a CSR layout: the dependencies of row i are dep_targets
+    [dep_offsets[i]:dep_offsets[i + 1]]. A target >= 0 is a row index; a
+    negative target -(k + 1) points at external_ids[k], a dependency on a
+    task outside the project.
+    
+    Rows are appended while streaming the tasks cursor, so the full task
+    documents never have to be held in memory at once. Call finalize()
+    after the last append to resolve dependencies.
+    """
+    
+    __slots__ = (
+        "ids",
+        "titles",
+        "status_codes",
+        "assignee_codes",
+        "due_dates",
+        "dep_offsets",
+        "dep_targets",
+        "external_ids",
+        "statuses",
+        "assignees",
+        "_status_lookup",
+        "_assignee_lookup",
+        "_raw_due",
+        "_pending_deps",
+    )
+    
+    def __init__(self):
+        self.ids: List[str] = []
+        self.titles: List[Optional[str]] = []
+        self.status_codes = array("b")
+        self.assignee_codes = array("i")
+        self.due_dates = array("q")
+        self.dep_offsets = array("i", [0])
+        self.dep_targets = array("i")
+        self.external_ids: List[str] = []
+        self.statuses: List[str] = [status.value for status in TaskStatus]
+        self.assignees: List[str] = []
+        self._status_lookup = {status: code for code, status in enumerate(self.statuses)}
+        self._assignee_lookup: Dict[str, int] = {}
+        self._raw_due: Dict[int, Any] = {}
+        self._pending_deps: List[List[str]] = []
+    
+    @classmethod
+    def from_documents(cls, docs: Iterable[dict]) -> "TaskTable":
+        """Build a finalized table from task documents."""
+        table = cls()
+        for doc in docs:
+            table.append(doc)
+        table.finalize()
+        return table
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def append(self, doc: dict) -> None:
+        """Add one task document as a row."""
+        row = len(self.ids)
+        self.ids.append(str(doc.get("_id", "")))
+        self.titles.append(doc.get("title"))
+        
+        status = doc.get("status") or "unknown"
+        code = self._status_lookup.get(status)
+        if code is None:
+            code = self._status_lookup[status] = len(self.statuses)
+            self.statuses.append(status)
+        self.status_codes.append(code)
+        
+        assignee = doc.get("assignee_id")
+        if assignee is None:
+            self.assignee_codes.append(NO_ASSIGNEE)
+        else:
+            code = self._assignee_lookup.get(assignee)
+            if code is None:
+                code = self._assignee_lookup[assignee] = len(self.assignees)
+                self.assignees.append(assignee)
+            self.assignee_codes.append(code)
+        
+        due = doc.get("due_date")
+        if isinstance(due, datetime) and due.tzinfo is None:
+            self.due_dates.append((due - EPOCH) // timedelta(microseconds=1))
+        else:
+            self.due_dates.append(NO_DATE)
+            if due is not None:
+                self._raw_due[row] = due
+        
+        self._pending_deps.append(doc.get("dependencies") or [])
+    
+    def finalize(self) -> "TaskTable":
+        """Resolve dependency IDs into the CSR arrays."""
+        index = {task_id: row for row, task_id in enumerate(self.ids)}
+        external: Dict[str, int] = {}
+        for deps in self._pending_deps:
+            for dep in deps:
+                row = index.get(dep)
+                if row is None:
+                    slot = external.get(dep)
+                    if slot is None:
+                        slot = external[dep] = len(self.external_ids)
+                        self.external_ids.append(dep)
+                    row = -(slot + 1)
+                self.dep_targets.append(row)
+            self.dep_offsets.append(len(self.dep_targets))
+        self._pending_deps = []
+        return self
+    
+    def status(self, row: int) -> str:
+        return self.statuses[self.status_codes[row]]
+    
+    def assignee(self, row: int) -> Optional[str]:
+        code = self.assignee_codes[row]
+        return None if code == NO_ASSIGNEE else self.assignees[code]
+    
+    def due_date(self, row: int) -> Any:
+        micros = self.due_dates[row]
+        if micros == NO_DATE:
+            return self._raw_due.get(row)
+        return EPOCH + timedelta(microseconds=micros)
+    
+    def dependency_rows(self, row: int) -> array:
+        """Dependency targets of a row (see the class docstring for encoding)."""
+        return self.dep_targets[self.dep_offsets[row]:self.dep_offsets[row + 1]]
+    
+    def dependencies(self, row: int) -> List[str]:
+        return [
+            self.ids[target] if target >= 0 else self.external_ids[-target - 1]
+            for target in self.dependency_rows(row)
+        ]
+    
+    def status_counts(self) -> Dict[str, int]:
+        """Number of tasks per status, in interning order."""
+        counts = [0] * len(self.statuses)
+        for code in self.status_codes:
+            counts[code] += 1
+        return {status: count for status, count in zip(self.statuses, counts) if count}
+    
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Yield each row as a task-like dict (for callers that want documents)."""
+        for row in range(len(self.ids)):
+            yield {
+                "_id": self.ids[row],
+                "title": self.titles[row],
+                "status": self.status(row),
+                "assignee_id": self.assignee(row),
+                "due_date": self.due_date(row),
+                "dependencies": self.dependencies(row),
+            }
+    
+    def format_lines(
+        self,
+        handles: Optional[Sequence[str]] = None,
+        external_handles: Optional[Sequence[str]] = None,
+        rows: Optional[Iterable[int]] = None,
+    ) -> List[str]:
+        """
+        Render the TASKS prompt section, one line per task (or per row in
+        `rows`).
+        
+        With `handles` (one per row, and `external_handles` for external_ids)
+        each line is prefixed with its handle and dependencies are written as
+        handles instead of full task IDs.
+        
+        A null assignee_id or due_date renders as "unassigned" / "no due
+        date", the same as a missing field.
+        """
+        statuses = self.statuses
+        assignees = self.assignees
+        ids = handles if handles is not None else self.ids
+        external_ids = external_handles if external_handles is not None else self.external_ids
+        offsets = self.dep_offsets
+        targets = self.dep_targets
+        lines = []
+        for row in rows if rows is not None else range(len(self.ids)):
+            due = self.due_date(row)
+            code = self.assignee_codes[row]
+            deps = ", ".join(
+                ids[target] if target >= 0 else external_ids[-target - 1]
+                for target in targets[offsets[row]:offsets[row + 1]]
+            ) or "none"
+            prefix = f"{handles[row]} " if handles is not None else ""
+            lines.append(
+                f"  - {prefix}[{statuses[self.status_codes[row]]}] {self.titles[row]}"
+                f" | Due: {'no due date' if due is None else due}"
+                f" | Assignee: {'unassigned' if code == NO_ASSIGNEE else assignees[code]}"
+                f" | Deps: {deps}"
+            )
+        return lines
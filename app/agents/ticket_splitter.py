@@ -1,8 +1,10 @@
 """Ticket Splitter Agent - Breaks down topics into subtasks using Grok."""
-from typing import Optional
-from pydantic import BaseModel
+from typing import Optional, Tuple
+from pydantic import BaseModel, ValidationError
+from app.agents.similarity import SimilarityCache
+from app.core.config import get_settings
 from app.core.llm import get_llm_client
-
+from app.core.metrics import TICKET_SPLITS
 
 class SubtaskOutput(BaseModel):
     """A single subtask generated by the agent."""
@@ -24,7 +26,83 @@ class TicketSplitResult(BaseModel):
     """Result of ticket splitting operation."""
     parent_task: ParentTaskOutput
     subtasks: list[SubtaskOutput]
-    reasoning: str
+    reasoning: str = ""
+
+
+# JSON schema sent with the request so the provider constrains the output
+SPLIT_SCHEMA = TicketSplitResult.model_json_schema()
+
+
+def strip_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing bracket, leaving string values alone."""
+    out = []
+    in_string = escaped = False
+    pending = None  # index in `out` of a comma that may be trailing
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            pending = None
+        elif ch in "}]":
+            if pending is not None:
+                del out[pending]
+                pending = None
+        elif ch == ",":
+            pending = len(out)
+        elif not ch.isspace():
+            pending = None
+        out.append(ch)
+    return "".join(out)
+
+
+def repair_json(text: str) -> Optional[str]:
+    """
+    Best-effort local fix for common LLM JSON damage: prose or markdown
+    fences around the object, trailing commas, and truncated output (the
+    partial last element is dropped and open strings/brackets are closed).
+    Returns None when there is no JSON object to salvage.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+    text = text[start:]
+    
+    stack = []
+    in_string = escaped = False
+    safe = None  # (cut index, closers needed) at the last clean boundary
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            safe = (i + 1, list(stack))
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return strip_trailing_commas(text[:i + 1])
+            safe = (i + 1, list(stack))
+        elif ch == ",":
+            safe = (i, list(stack))
+    
+    if safe is None:
+        return None
+    cut, closers = safe
+    return strip_trailing_commas(text[:cut] + "".join(reversed(closers)))
 
 
 class TicketSplitterAgent:
@@ -33,6 +111,33 @@ class TicketSplitterAgent:
     def __init__(self):
         self.name = "TicketSplitterAgent"
         self.llm = get_llm_client()
+        # How each response was turned into a result, for fallback-rate tracking
+        self.outcomes = {"parsed": 0, "repaired": 0, "retried": 0, "fallback": 0}
+        settings = get_settings()
+        self.cache = SimilarityCache(
+            threshold=settings.split_cache_threshold,
+            max_entries=settings.split_cache_size,
+            ttl_seconds=settings.split_cache_ttl_hours * 3600,
+        )
+    
+    def outcome_summary(self) -> dict:
+        """Outcome counters plus the share of calls that needed the fallback."""
+        total = sum(self.outcomes.values())
+        return {
+            **self.outcomes,
+            "fallback_rate": round(self.outcomes["fallback"] / total, 4) if total else 0.0,
+            "cache": self.cache.stats(),
+        }
+    
+    @staticmethod
+    def _validate(text: Optional[str]) -> Tuple[Optional[TicketSplitResult], str]:
+        """Validate a JSON response against TicketSplitResult."""
+        if not text:
+            return None, "empty response"
+        try:
+            return TicketSplitResult.model_validate_json(text), ""
+        except ValidationError as e:
+            return None, str(e)[:500]
     
     @property
     def system_prompt(self) -> str:
@@ -76,7 +181,43 @@ Output format (JSON only, no markdown):
         project_context: Optional[dict] = None
     ) -> TicketSplitResult:
         """Split a topic into parent task + subtasks."""
+        result, outcome = await self._split(topic, context, project_context)
+        self.outcomes[outcome] += 1
+        TICKET_SPLITS.labels(outcome).inc()
+        return result
+    
+    async def split_ticket_cached(
+        self,
+        topic: str,
+        context: Optional[str] = None,
+        project_context: Optional[dict] = None,
+        scope: str = "",
+    ) -> Tuple[TicketSplitResult, str]:
+        """
+        Split a topic, reusing an earlier split of a near-duplicate topic in
+        the same scope (e.g. project). Returns (result, outcome), where
+        outcome is "cache_hit" or how the LLM response was handled (see
+        `outcomes`). Fallback breakdowns are never cached.
+        """
+        cached = self.cache.lookup(scope, topic, context)
+        if cached is not None:
+            TICKET_SPLITS.labels("cache_hit").inc()
+            return cached[0].model_copy(deep=True), "cache_hit"
         
+        result, outcome = await self._split(topic, context, project_context)
+        self.outcomes[outcome] += 1
+        TICKET_SPLITS.labels(outcome).inc()
+        if outcome != "fallback":
+            self.cache.store(scope, topic, context, result.model_copy(deep=True))
+        return result, outcome
+    
+    async def _split(
+        self,
+        topic: str,
+        context: Optional[str],
+        project_context: Optional[dict],
+    ) -> Tuple[TicketSplitResult, str]:
+        """Run the LLM split; returns the result and how it was obtained."""
         # Build the prompt
         prompt_parts = [f"Topic: {topic}"]
         
@@ -93,58 +234,73 @@ Output format (JSON only, no markdown):
         prompt = "\n".join(prompt_parts)
         prompt += "\n\nGenerate the task breakdown as JSON:"
         
-        # Call LLM
-        response = await self.llm.structured_output(
+        # Call LLM in structured output mode
+        response = await self.llm.json_output(
             prompt=prompt,
             system_prompt=self.system_prompt,
-            temperature=0.4  # Balanced creativity
+            schema=SPLIT_SCHEMA,
+            schema_name="ticket_split",
+            temperature=0.4,  # Balanced creativity
+            agent=self.name,
         )
         
-        # Parse JSON response
-        import json
+        result, error = self._validate(response)
+        if result:
+            return result, "parsed"
+        
+        result, _ = self._validate(repair_json(response))
+        if result:
+            return result, "repaired"
+        
+        # One short follow-up asking the model to fix its own output
         try:
-            # Clean response if wrapped in markdown
-            clean_response = response.strip()
-            if clean_response.startswith("```"):
-                clean_response = clean_response.split("```")[1]
-                if clean_response.startswith("json"):
-                    clean_response = clean_response[4:]
-                clean_response = clean_response.strip()
-            
-            data = json.loads(clean_response)
-            
-            return TicketSplitResult(
-                parent_task=ParentTaskOutput(**data["parent_task"]),
-                subtasks=[SubtaskOutput(**st) for st in data["subtasks"]],
-                reasoning=data.get("reasoning", "")
-            )
-        except (json.JSONDecodeError, KeyError) as e:
-            # Fallback: create basic structure from topic
-            return TicketSplitResult(
-                parent_task=ParentTaskOutput(
-                    title=topic[:60],
-                    description=context or topic,
-                    priority=2
+            retry = await self.llm.json_output(
+                prompt=(
+                    "Your previous reply did not match the required JSON schema.\n"
+                    f"Validation error: {error}\n\n"
+                    f"Previous reply:\n{response[:8000]}\n\n"
+                    "Return only the corrected JSON object."
                 ),
-                subtasks=[
-                    SubtaskOutput(
-                        title=f"Implement {topic[:50]}",
-                        priority=2,
-                        labels=["todo"]
-                    ),
-                    SubtaskOutput(
-                        title=f"Test {topic[:50]}",
-                        priority=3,
-                        labels=["testing"]
-                    ),
-                    SubtaskOutput(
-                        title=f"Document {topic[:50]}",
-                        priority=4,
-                        labels=["docs"]
-                    )
-                ],
-                reasoning=f"Fallback breakdown due to parsing error: {str(e)}"
+                system_prompt=None,
+                schema=SPLIT_SCHEMA,
+                schema_name="ticket_split",
+                temperature=0.0,
+                agent=self.name,
             )
+            result, error = self._validate(retry)
+            if not result:
+                result, _ = self._validate(repair_json(retry))
+        except Exception as e:
+            error = str(e)
+        if result:
+            return result, "retried"
+        
+        # Fallback: create basic structure from topic
+        return TicketSplitResult(
+            parent_task=ParentTaskOutput(
+                title=topic[:60],
+                description=context or topic,
+                priority=2
+            ),
+            subtasks=[
+                SubtaskOutput(
+                    title=f"Implement {topic[:50]}",
+                    priority=2,
+                    labels=["todo"]
+                ),
+                SubtaskOutput(
+                    title=f"Test {topic[:50]}",
+                    priority=3,
+                    labels=["testing"]
+                ),
+                SubtaskOutput(
+                    title=f"Document {topic[:50]}",
+                    priority=4,
+                    labels=["docs"]
+                )
+            ],
+            reasoning=f"Fallback breakdown due to parsing error: {error}"
+        ), "fallback"
 
 
 # Singleton instance
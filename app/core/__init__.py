@@ -1,6 +1,10 @@
 from .config import get_settings
-from .database import connect_to_mongo, close_mongo_connection, get_database, is_db_connected
+from .database import connect_to_mongo, close_mongo_connection, get_database, is_db_connected, is_in_memory
+from .memory_db import MemoryDatabase
 from .llm import get_llm_client, LLMClient
+from .events import get_event_sink, EventSink
+from .change_feed import get_change_feed, ChangeFeed
+from .versioning import parse_expected_version, version_filter, VERSION_HEADER
 
 __all__ = [
     "get_settings",
@@ -8,6 +12,15 @@ __all__ = [
     "close_mongo_connection",
     "get_database",
     "is_db_connected",
+    "is_in_memory",
+    "MemoryDatabase",
     "get_llm_client",
     "LLMClient",
+    "get_event_sink",
+    "EventSink",
+    "get_change_feed",
+    "ChangeFeed",
+    "parse_expected_version",
+    "version_filter",
+    "VERSION_HEADER",
 ]
@@ -0,0 +1,189 @@
+"""
+Change Feed - Pushes project deltas to connected clients.
+One MongoDB change-stream watcher per worker fans out to all subscribers.
+Without a replica set, write routes publish the same deltas in-process.
+"""
+import asyncio
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
+
+from app.core.serialization import dumps
+
+WATCHED_COLLECTIONS = ["tasks", "milestones", "risks", "events"]
+
+# Documents whose project is remembered for attributing change-stream deletes
+OWNER_CACHE_SIZE = 50_000
+
+
+def encode_delta(delta: Dict[str, Any]) -> str:
+    """Serialize a delta for the wire (ObjectIds and datetimes as strings)."""
+    return dumps(delta).decode()
+
+
+class ChangeFeed:
+    """
+    Per-worker fan-out of task, milestone, risk and event deltas.
+    
+    Delta format:
+        {"collection": "tasks", "op": "insert|replace", "id": "...", "document": {...}}
+        {"collection": "tasks", "op": "update", "id": "...", "fields": {...}}
+        {"collection": "tasks", "op": "delete", "id": "..."}
+        {"op": "resync"}  # subscriber fell behind; refetch the full state
+    
+    Change-stream deletes carry only the document ID, so they are attributed
+    through the projects of documents this worker has seen inserted or
+    updated; deletes of documents it never saw are dropped rather than sent
+    to other projects.
+    """
+    
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self.streaming = False  # True while the change stream is delivering
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._owners: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._watcher: Optional[asyncio.Task] = None
+        self._resume_token = None
+    
+    def subscribe(self, project_id: str) -> asyncio.Queue:
+        """Register a subscriber queue for a project's deltas."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[project_id].add(queue)
+        return queue
+    
+    def unsubscribe(self, project_id: str, queue: asyncio.Queue):
+        """Remove a subscriber queue."""
+        subscribers = self._subscribers.get(project_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[project_id]
+    
+    def publish(self, project_id: str, delta: Dict[str, Any]):
+        """Deliver a delta to a project's subscribers."""
+        for queue in list(self._subscribers.get(project_id, ())):
+            try:
+                queue.put_nowait(delta)
+            except asyncio.QueueFull:
+                # Slow consumer: drop its backlog and tell it to refetch
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"op": "resync"})
+    
+    def notify(
+        self,
+        project_id: str,
+        collection: str,
+        op: str,
+        entity_id: Any,
+        document: Optional[dict] = None,
+        fields: Optional[dict] = None,
+    ):
+        """
+        Publish a delta from a write route.
+        No-op while the change stream is active, since it reports the same write.
+        """
+        self._remember(collection, str(entity_id), project_id)
+        if self.streaming or not self._subscribers.get(project_id):
+            return
+        
+        delta = {"collection": collection, "op": op, "id": str(entity_id)}
+        if document is not None:
+            delta["document"] = document
+        if fields is not None:
+            delta["fields"] = fields
+        self.publish(project_id, delta)
+    
+    def _remember(self, collection: str, entity_id: str, project_id: Optional[str]):
+        """Record which project a document belongs to (LRU-bounded)."""
+        if project_id is None:
+            return
+        key = (collection, entity_id)
+        self._owners[key] = project_id
+        self._owners.move_to_end(key)
+        if len(self._owners) > OWNER_CACHE_SIZE:
+            self._owners.popitem(last=False)
+    
+    async def start(self, db: Optional[AsyncIOMotorDatabase]):
+        """Start the shared change-stream watcher for this worker."""
+        if db is None or self._watcher is not None:
+            return
+        self._watcher = asyncio.create_task(self._watch(db))
+    
+    async def stop(self):
+        """Stop the watcher."""
+        if self._watcher is None:
+            return
+        self._watcher.cancel()
+        try:
+            await self._watcher
+        except asyncio.CancelledError:
+            pass
+        self._watcher = None
+    
+    async def _watch(self, db: AsyncIOMotorDatabase):
+        """Consume the database change stream, resuming after transient errors."""
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": WATCHED_COLLECTIONS},
+            "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+        }}]
+        
+        while True:
+            try:
+                async with db.watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=self._resume_token,
+                ) as stream:
+                    self.streaming = True
+                    print("Change feed: watching MongoDB change stream")
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        self._dispatch(change)
+            except OperationFailure as e:
+                # Standalone servers don't support change streams
+                print(f"Change feed: change streams unavailable ({e}); using in-process notifications")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Change feed: stream interrupted ({e}); retrying")
+                await asyncio.sleep(5)
+            finally:
+                self.streaming = False
+    
+    def _dispatch(self, change: Dict[str, Any]):
+        """Translate a change event into a delta and publish it."""
+        op = change["operationType"]
+        collection = change["ns"]["coll"]
+        entity_id = str(change["documentKey"]["_id"])
+        delta = {"collection": collection, "op": op, "id": entity_id}
+        
+        if op == "delete":
+            project_id = self._owners.pop((collection, entity_id), None)
+            if project_id is not None:
+                self.publish(project_id, delta)
+            return
+        
+        document = change.get("fullDocument")
+        if op in ("insert", "replace") and document is not None:
+            delta["document"] = document
+        elif op == "update":
+            delta["fields"] = change.get("updateDescription", {}).get("updatedFields", {})
+        
+        project_id = document.get("project_id") if document else None
+        if project_id is None:
+            return  # Updated document was deleted before the lookup
+        self._remember(collection, entity_id, project_id)
+        self.publish(project_id, delta)
+
+
+# Singleton instance
+change_feed = ChangeFeed()
+
+
+def get_change_feed() -> ChangeFeed:
+    """Get change feed instance for dependency injection."""
+    return change_feed
@@ -8,11 +8,13 @@ class Settings(BaseSettings):
     # MongoDB
     mongodb_uri: str = "mongodb://localhost:27017"
     database_name: str = "typeshii"
+    allow_in_memory_fallback: bool = False  # Use the in-memory store if MONGODB_URI is unreachable
     
     # Grok (xAI) API
     grok_api_key: str = ""
     grok_model: str = "grok-2-latest"
     grok_base_url: str = "https://api.x.ai/v1"
+    llm_max_concurrency: int = 8  # Simultaneous in-flight LLM requests per worker
     
     # Environment
     environment: str = "development"
@@ -23,6 +25,43 @@ class Settings(BaseSettings):
     
     # API
     api_prefix: str = "/api/v1"
+    bulk_max_items: int = 5000  # Upper bound on items per bulk request
+    compression_min_size: int = 1024  # Compress responses at least this many bytes
+    export_batch_size: int = 1000  # Cursor batch size for NDJSON exports
+    
+    # Audit trail event buffering
+    event_buffer_size: int = 10000  # Emitters wait when this many events are pending
+    event_batch_size: int = 500
+    event_flush_interval_ms: int = 250
+    event_durable_writes: bool = False  # Always wait for events to be persisted
+    event_retention_days: int = 90  # Raw events expire via TTL index; 0 keeps them forever
+    velocity_window_days: int = 14  # Days of daily rollups given to agents
+    
+    # Delta prompting: re-analyze only what changed since an agent's last run
+    delta_max_changes: int = 50  # Full analysis above this many task changes; 0 disables deltas
+    delta_max_age_hours: int = 24  # Previous runs older than this are not reused
+    
+    # Ticket split cache: reuse splits of near-duplicate topics within a project
+    split_cache_size: int = 1000  # Cached splits per worker; 0 disables the cache
+    split_cache_threshold: float = 0.88  # Minimum cosine similarity of topic (and context)
+    split_cache_ttl_hours: int = 24
+    
+    # User directory cache (assignee name resolution)
+    user_cache_size: int = 10000
+    user_cache_ttl_seconds: int = 300
+    user_cache_negative_ttl_seconds: int = 60  # How long unknown IDs are remembered
+    
+    # Request tracing
+    server_timing: bool = True  # Add a Server-Timing header with per-span durations
+    trace_file: str = ""  # Append each request's trace here as OTLP/JSON lines
+    trace_service_name: str = "typeshii-api"
+    
+    # Opt-in request profiling (off unless PROFILING_ENABLED is set)
+    profiling_enabled: bool = False  # Accept X-Profile and serve /debug/profiles
+    admin_token: str = ""  # Required (as X-Admin-Token) for profiling in production
+    profile_dir: str = ""  # Where profiles are stored (default: system temp dir)
+    profile_interval_ms: float = 2.0  # Stack sampling interval
+    profile_keep: int = 20  # Newest profiles kept on disk
     
     class Config:
         env_file = ".env"
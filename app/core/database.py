@@ -1,7 +1,10 @@
 import ssl
 import certifi
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
 from app.core.config import get_settings
+from app.core.memory_db import MemoryDatabase
+from app.core.metrics import MongoCommandListener
 
 settings = get_settings()
 
@@ -12,16 +15,28 @@ class Database:
     client: AsyncIOMotorClient = None
     db: AsyncIOMotorDatabase = None
     connected: bool = False
+    in_memory: bool = False
+
+
+def use_in_memory_database():
+    """Fall back to the process-local in-memory backend."""
+    db_instance.client = None
+    db_instance.db = MemoryDatabase(settings.database_name)
+    db_instance.connected = False
+    db_instance.in_memory = True
 
 
 db_instance = Database()
 
 
 async def connect_to_mongo():
-    """Create MongoDB connection pool (optional - skips if no URI configured)."""
+    """
+    Create MongoDB connection pool (optional - skips if no URI configured).
+    Raises if a configured MongoDB is unreachable, unless ALLOW_IN_MEMORY_FALLBACK is set.
+    """
     if not settings.mongodb_uri or settings.mongodb_uri == "mongodb://localhost:27017":
         print("MongoDB not configured - running without database (in-memory mode)")
-        db_instance.connected = False
+        use_in_memory_database()
         return
     
     try:
@@ -44,6 +59,7 @@ async def connect_to_mongo():
             tls=True,
             tlsAllowInvalidCertificates=True,
             tlsAllowInvalidHostnames=True,
+            event_listeners=[MongoCommandListener()],
         )
         db_instance.db = db_instance.client[settings.database_name]
         
@@ -51,10 +67,45 @@ async def connect_to_mongo():
         await db_instance.client.admin.command("ping")
         db_instance.connected = True
         print(f"Connected to MongoDB: {settings.database_name}")
+        
+        await ensure_indexes(db_instance.db)
     except Exception as e:
         print(f"MongoDB connection failed: {e}")
+        if db_instance.client is not None:
+            db_instance.client.close()
+            db_instance.client = None
+        if not settings.allow_in_memory_fallback:
+            # Each worker would get its own empty store; refuse to start instead
+            raise RuntimeError(
+                "MongoDB is configured but unreachable "
+                "(set ALLOW_IN_MEMORY_FALLBACK=true to run in-memory)"
+            ) from e
         print("Running without database (in-memory mode)")
-        db_instance.connected = False
+        use_in_memory_database()
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """Create the indexes the routes and agents rely on (idempotent)."""
+    try:
+        await db.tasks.create_index("project_id")
+        await db.tasks.create_index([("project_id", 1), ("updated_at", 1)])
+        await db.milestones.create_index("project_id")
+        await db.risks.create_index("project_id")
+        await db.events.create_index([("project_id", 1), ("timestamp", -1)])
+        await db.event_rollups.create_index([("project_id", 1), ("date", 1)])
+        
+        if settings.event_retention_days > 0:
+            ttl = settings.event_retention_days * 86400
+            try:
+                await db.events.create_index("timestamp", expireAfterSeconds=ttl)
+            except OperationFailure:
+                # TTL index exists with a different retention - update it in place
+                await db.command(
+                    "collMod", "events",
+                    index={"keyPattern": {"timestamp": 1}, "expireAfterSeconds": ttl},
+                )
+    except Exception as e:
+        print(f"Index creation failed: {e}")
 
 
 async def close_mongo_connection():
@@ -65,8 +116,8 @@ async def close_mongo_connection():
 
 
 def get_database() -> AsyncIOMotorDatabase:
-    """Get database instance for dependency injection."""
-    if not db_instance.connected:
+    """Get database instance (MongoDB or the in-memory backend) for dependency injection."""
+    if not db_instance.connected and not db_instance.in_memory:
         return None
     return db_instance.db
 
@@ -74,3 +125,8 @@ def get_database() -> AsyncIOMotorDatabase:
 def is_db_connected() -> bool:
     """Check if database is connected."""
     return db_instance.connected
+
+
+def is_in_memory() -> bool:
+    """Check if the in-memory backend is serving requests."""
+    return db_instance.in_memory
@@ -0,0 +1,169 @@
+"""
+Event Sink - Buffered asynchronous writer for the audit trail.
+Batches events in-process and flushes them with insert_many so task writes
+don't pay an extra database round trip.
+"""
+import asyncio
+from typing import List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.database import get_database
+from app.core.rollups import apply_rollups
+from app.core.change_feed import get_change_feed
+from app.core.revisions import bump_revisions
+
+settings = get_settings()
+
+_STOP = object()
+
+
+class EventSink:
+    """
+    In-process event buffer flushed on size or time thresholds.
+    
+    - emit() blocks when the buffer is full (backpressure)
+    - durable=True waits until the events have been written (read-your-write)
+    - stop() flushes everything still buffered
+    """
+    
+    def __init__(
+        self,
+        max_buffer: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.25,
+    ):
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+    
+    async def start(self):
+        """Start the background flush loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_buffer)
+        self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Flush buffered events and stop the background loop."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._worker
+        self._worker = None
+    
+    async def emit(self, events: List[dict], durable: bool = False):
+        """
+        Queue events for the audit trail.
+        
+        Args:
+            events: Event documents to insert
+            durable: Wait until the events are persisted before returning
+        """
+        if not events:
+            return
+        
+        # Not started (scripts, tests): write through directly
+        if not self.running:
+            await self._insert(events)
+            return
+        
+        waiter = asyncio.get_running_loop().create_future() if durable else None
+        for i, event in enumerate(events):
+            # Only the last event carries the waiter; batches flush in order
+            await self._queue.put((event, waiter if i == len(events) - 1 else None))
+        
+        if waiter:
+            await waiter
+    
+    async def _run(self):
+        """Collect events into batches and flush them."""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1][1] is None:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            await self._flush(batch)
+        
+        # Drain anything queued behind the stop marker
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+    
+    async def _flush(self, batch: List[Tuple[dict, Optional[asyncio.Future]]]):
+        """Write a batch and release any durable waiters."""
+        error = None
+        try:
+            await self._insert([event for event, _ in batch])
+        except Exception as e:
+            print(f"Event flush failed ({len(batch)} events): {e}")
+            error = e
+        
+        for _, waiter in batch:
+            if waiter and not waiter.done():
+                if error:
+                    waiter.set_exception(error)
+                else:
+                    waiter.set_result(None)
+    
+    async def _insert(self, events: List[dict]):
+        db = get_database()
+        if db is None:
+            return
+        await db.events.insert_many(events, ordered=False)
+        # The /state event feed changed, so cached copies are stale; a failed
+        # invalidation must not report the already-written events as lost
+        try:
+            await bump_revisions(db, [event["project_id"] for event in events])
+        except Exception as e:
+            print(f"Revision bump failed after event flush ({len(events)} events): {e}")
+        
+        feed = get_change_feed()
+        for event in events:
+            feed.notify(event["project_id"], "events", "insert", event["_id"], document=event)
+        
+        # Rollups are derived data; never lose the raw events over them
+        try:
+            await apply_rollups(db, events)
+        except Exception as e:
+            print(f"Event rollup update failed ({len(events)} events): {e}")
+
+
+# Singleton instance
+event_sink = EventSink(
+    max_buffer=settings.event_buffer_size,
+    batch_size=settings.event_batch_size,
+    flush_interval=settings.event_flush_interval_ms / 1000,
+)
+
+
+def get_event_sink() -> EventSink:
+    """Get event sink instance for dependency injection."""
+    return event_sink
@@ -0,0 +1,53 @@
+"""
+Label Index - Per-project label frequencies, cached per project revision.
+Every task write bumps the project's revision, so a cached index is reused
+until the next write and rebuilt with one $unwind/$group aggregation.
+"""
+from collections import OrderedDict
+from typing import List, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+LABEL_CACHE_SIZE = 1024  # Projects whose index is kept per worker
+
+_cache: "OrderedDict[str, Tuple[int, List[dict]]]" = OrderedDict()
+
+
+def label_pipeline(project_id: str) -> List[dict]:
+    """Aggregation counting how many of a project's tasks carry each label."""
+    return [
+        {"$match": {"project_id": project_id}},
+        {"$project": {"labels": 1}},
+        {"$unwind": "$labels"},
+        {"$group": {"_id": "$labels", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1, "_id": 1}},
+    ]
+
+
+async def get_label_counts(db: AsyncIOMotorDatabase, project: dict) -> List[dict]:
+    """
+    Label frequencies for a project, most used first, as [{"label", "count"}].
+    `project` needs its _id and revision; the result is shared, do not mutate it.
+    """
+    project_id = str(project["_id"])
+    revision = project.get("revision", 0)
+    
+    cached = _cache.get(project_id)
+    if cached and cached[0] == revision:
+        _cache.move_to_end(project_id)
+        return cached[1]
+    
+    counts = [
+        {"label": doc["_id"], "count": doc["count"]}
+        async for doc in db.tasks.aggregate(label_pipeline(project_id))
+    ]
+    _cache[project_id] = (revision, counts)
+    _cache.move_to_end(project_id)
+    if len(_cache) > LABEL_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return counts
+
+
+async def top_labels(db: AsyncIOMotorDatabase, project: dict, limit: int = 20) -> List[str]:
+    """The `limit` most used labels in a project."""
+    return [row["label"] for row in (await get_label_counts(db, project))[:limit]]
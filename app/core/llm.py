@@ -2,9 +2,13 @@
 LLM Client - Abstraction layer for Grok (xAI) API.
 Designed for easy provider swapping if needed.
 """
+import asyncio
+import time
 import httpx
 from typing import List, Dict, Any, Optional
 from app.core.config import get_settings
+from app.core.metrics import LLM_IN_PROGRESS, LLM_WAITING, record_llm_call, record_llm_tokens
+from app.core.tracing import span
 
 settings = get_settings()
 
@@ -20,6 +24,36 @@ class LLMClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+        # Token counters reported by the provider; cached_tokens is the part
+        # of the prompt served from the provider's prefix cache
+        self.usage = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0,
+        }
+        self.json_schema_supported = True
+        # Caps concurrent requests to the provider across all callers
+        self.slots = asyncio.Semaphore(max(settings.llm_max_concurrency, 1))
+    
+    def record_usage(self, usage: Optional[Dict[str, Any]], agent: Optional[str] = None) -> None:
+        """Accumulate the `usage` block of a chat completion response."""
+        if not usage:
+            return
+        record_llm_tokens(agent, usage)
+        self.usage["requests"] += 1
+        self.usage["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        self.usage["completion_tokens"] += usage.get("completion_tokens") or 0
+        details = usage.get("prompt_tokens_details") or {}
+        self.usage["cached_tokens"] += details.get("cached_tokens") or 0
+    
+    def usage_summary(self) -> Dict[str, Any]:
+        """Token counters plus the share of prompt tokens served from cache."""
+        prompt_tokens = self.usage["prompt_tokens"]
+        return {
+            **self.usage,
+            "cache_hit_rate": round(self.usage["cached_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0,
+        }
     
     async def chat_completion(
         self,
@@ -27,6 +61,8 @@ class LLMClient:
         temperature: float = 0.7,
         max_tokens: int = 2048,
         system_prompt: Optional[str] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        agent: Optional[str] = None,
     ) -> str:
         """
         Send a chat completion request to Grok API.
@@ -36,6 +72,8 @@ class LLMClient:
             temperature: Sampling temperature (0-2)
             max_tokens: Maximum tokens in response
             system_prompt: Optional system prompt to prepend
+            response_format: Optional OpenAI-style response_format (JSON mode)
+            agent: Calling agent's name, used to label metrics
             
         Returns:
             The assistant's response text
@@ -49,22 +87,45 @@ class LLMClient:
             "temperature": temperature,
             "max_tokens": max_tokens,
         }
+        if response_format:
+            payload["response_format"] = response_format
+        
+        if self.slots.locked():
+            with LLM_WAITING.track_inprogress(), span("llm_wait", agent=agent or ""):
+                await self.slots.acquire()
+        else:
+            await self.slots.acquire()
+        start = time.perf_counter()
+        try:
+            with LLM_IN_PROGRESS.track_inprogress(), span("llm", agent=agent or "", model=self.model) as s:
+                async with httpx.AsyncClient(timeout=60.0) as client:
+                    response = await client.post(
+                        f"{self.base_url}/chat/completions",
+                        headers=self.headers,
+                        json=payload,
+                    )
+                    response.raise_for_status()
+                    data = response.json()
+                if s is not None:
+                    usage = data.get("usage") or {}
+                    s.attributes["prompt_tokens"] = usage.get("prompt_tokens") or 0
+                    s.attributes["completion_tokens"] = usage.get("completion_tokens") or 0
+        except Exception:
+            record_llm_call(agent, time.perf_counter() - start, error=True)
+            raise
+        finally:
+            self.slots.release()
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=payload,
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data["choices"][0]["message"]["content"]
+        record_llm_call(agent, time.perf_counter() - start, error=False)
+        self.record_usage(data.get("usage"), agent)
+        return data["choices"][0]["message"]["content"]
     
     async def structured_output(
         self,
         prompt: str,
         system_prompt: str,
         temperature: float = 0.3,
+        agent: Optional[str] = None,
     ) -> str:
         """
         Get structured output for agent tasks.
@@ -76,8 +137,64 @@ class LLMClient:
             system_prompt=system_prompt,
             temperature=temperature,
             max_tokens=4096,
+            agent=agent,
         )
 
+    
+    async def json_output(
+        self,
+        prompt: str,
+        system_prompt: Optional[str],
+        schema: Dict[str, Any],
+        schema_name: str,
+        temperature: float = 0.3,
+        max_tokens: int = 4096,
+        agent: Optional[str] = None,
+    ) -> str:
+        """
+        Get a JSON response constrained to `schema` (structured output mode).
+        
+        Falls back to plain JSON object mode if the provider rejects
+        json_schema as unsupported, and remembers that for later calls.
+        Other 400s (context length, malformed prompt) are raised as usual.
+        """
+        messages = [{"role": "user", "content": prompt}]
+        if self.json_schema_supported:
+            try:
+                return await self.chat_completion(
+                    messages=messages,
+                    system_prompt=system_prompt,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    agent=agent,
+                    response_format={
+                        "type": "json_schema",
+                        "json_schema": {"name": schema_name, "schema": schema},
+                    },
+                )
+            except httpx.HTTPStatusError as e:
+                if not _rejects_json_schema(e.response):
+                    raise
+                print(f"LLM provider rejected json_schema; using json_object mode ({e.response.text[:200]})")
+                self.json_schema_supported = False
+        
+        return await self.chat_completion(
+            messages=messages,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            agent=agent,
+            response_format={"type": "json_object"},
+        )
+
+
+def _rejects_json_schema(response: httpx.Response) -> bool:
+    """Whether an error response says the json_schema response format is unsupported."""
+    if response.status_code != 400:
+        return False
+    body = response.text.lower()
+    return "response_format" in body or "json_schema" in body
+
 
 # Singleton instance
 llm_client = LLMClient()
@@ -0,0 +1,110 @@
+"""
+Document Loaders - Batched, de-duplicated fetches of documents by ID.
+Loads requested in the same event loop tick (by one request or many
+concurrent ones) are coalesced into a single $in query, DataLoader-style,
+and loads of the same ID queued in that tick share one result. A load never
+joins a query that was already sent, so a request always reads data at
+least as new as the writes that finished before it started.
+"""
+import asyncio
+import weakref
+from typing import Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Running batch queries (the event loop only keeps weak references to tasks)
+_dispatches: Set[asyncio.Task] = set()
+
+
+def parse_ids(ids: str) -> List[str]:
+    """Split a comma-separated ID list, dropping blanks and repeats (order kept)."""
+    parsed = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if len(parsed) > settings.bulk_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many IDs: {len(parsed)} (max {settings.bulk_max_items})",
+        )
+    return parsed
+
+
+class DocumentLoader:
+    """Loads documents of one collection within one project by ObjectId string."""
+    
+    def __init__(self, db: AsyncIOMotorDatabase, collection: str, project_id: str):
+        self.collection = db[collection]
+        self.project_id = project_id
+        self._queued: Dict[str, asyncio.Future] = {}
+    
+    async def load_many(self, ids: List[str]) -> List[Optional[dict]]:
+        """Documents for `ids` in the same order; None where there is no match."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for doc_id in ids:
+            future = self._queued.get(doc_id)
+            if future is None:
+                if not self._queued:
+                    loop.call_soon(self._start_dispatch)
+                future = self._queued[doc_id] = loop.create_future()
+            futures.append(future)
+        # Shielded so a cancelled request does not cancel loads others await
+        return list(await asyncio.gather(*map(asyncio.shield, futures)))
+    
+    def _start_dispatch(self) -> None:
+        # Keep a reference so the task is not garbage-collected mid-query
+        task = asyncio.ensure_future(self._dispatch())
+        _dispatches.add(task)
+        task.add_done_callback(_dispatches.discard)
+    
+    async def _dispatch(self) -> None:
+        batch, self._queued = self._queued, {}
+        try:
+            object_ids = [ObjectId(doc_id) for doc_id in batch if ObjectId.is_valid(doc_id)]
+            found = {}
+            if object_ids:
+                found = {
+                    str(doc["_id"]): doc
+                    async for doc in self.collection.find({
+                        "_id": {"$in": object_ids},
+                        "project_id": self.project_id,
+                    })
+                }
+            for doc_id, future in batch.items():
+                if not future.done():
+                    future.set_result(found.get(doc_id))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+
+
+# Loaders live only while some request is waiting on them
+_loaders: "weakref.WeakValueDictionary[Tuple[str, str], DocumentLoader]" = weakref.WeakValueDictionary()
+
+
+def get_loader(db: AsyncIOMotorDatabase, collection: str, project_id: str) -> DocumentLoader:
+    """Shared loader for a collection within a project."""
+    key = (collection, project_id)
+    loader = _loaders.get(key)
+    if loader is None:
+        loader = _loaders[key] = DocumentLoader(db, collection, project_id)
+    return loader
+
+
+async def load_by_ids(
+    db: AsyncIOMotorDatabase,
+    collection: str,
+    project_id: str,
+    ids: List[str],
+) -> Tuple[List[dict], List[str]]:
+    """Found documents in request order, and the IDs that matched nothing."""
+    docs = await get_loader(db, collection, project_id).load_many(ids)
+    return (
+        [doc for doc in docs if doc is not None],
+        [doc_id for doc_id, doc in zip(ids, docs) if doc is None],
+    )
@@ -0,0 +1,670 @@
+"""
+In-Memory Database - Process-local stand-in for MongoDB.
+Implements the subset of the Motor API the routes use, so the app works
+(and can be load tested) without a MongoDB deployment. Aggregation supports
+the $match/$unwind/$group/$sort/$skip/$limit/$project stages.
+
+Indexes:
+- hash index on `project_id` for every collection
+- sorted index on `events.timestamp`
+"""
+import bisect
+import itertools
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+_MISSING = object()
+
+HASH_INDEXED_FIELDS = ("project_id",)
+SORTED_INDEXED_FIELDS = {"events": "timestamp"}
+
+
+# --- Document helpers ---
+
+def _naive_utc(value: Any) -> Any:
+    """Aware datetimes as naive UTC, the form MongoDB stores and returns."""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _copy(value: Any) -> Any:
+    """Copy nested dicts/lists so callers never share state with the store."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return _naive_utc(value)
+
+
+def _get(doc: dict, path: str) -> Any:
+    """Resolve a dotted path, returning _MISSING if any segment is absent."""
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set(doc: dict, path: str, value: Any):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset(doc: dict, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    """Order values roughly like BSON: missing/null < numbers < strings < ... < dates."""
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (5, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (4, str(value))
+    if isinstance(value, datetime):
+        return (6, _naive_utc(value))
+    return (3, str(value))
+
+
+# --- Query matching ---
+
+def _compare(op: str, actual: Any, expected: Any) -> bool:
+    if actual is _MISSING or actual is None:
+        return False
+    actual, expected = _naive_utc(actual), _naive_utc(expected)
+    try:
+        if op == "$gt":
+            return actual > expected
+        if op == "$gte":
+            return actual >= expected
+        if op == "$lt":
+            return actual < expected
+        if op == "$lte":
+            return actual <= expected
+    except TypeError:
+        return False
+    raise OperationFailure(f"Unsupported query operator: {op}")
+
+
+def _equals(actual: Any, expected: Any) -> bool:
+    """Mongo equality: null matches missing, arrays match any element."""
+    if expected is None:
+        return actual is _MISSING or actual is None
+    if actual is _MISSING:
+        return False
+    expected = _naive_utc(expected)
+    if isinstance(actual, list) and not isinstance(expected, list):
+        return expected in actual
+    return _naive_utc(actual) == expected
+
+
+def _match_condition(actual: Any, condition: Any) -> bool:
+    if not (isinstance(condition, dict) and condition and next(iter(condition)).startswith("$")):
+        return _equals(actual, condition)
+    
+    for op, expected in condition.items():
+        if op == "$in":
+            if not any(_equals(actual, value) for value in expected):
+                return False
+        elif op == "$nin":
+            if any(_equals(actual, value) for value in expected):
+                return False
+        elif op == "$ne":
+            if _equals(actual, expected):
+                return False
+        elif op == "$exists":
+            if (actual is not _MISSING) != bool(expected):
+                return False
+        elif not _compare(op, actual, expected):
+            return False
+    return True
+
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    """Evaluate a Mongo filter against a document."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    """Apply an inclusion or exclusion projection (returns a copy)."""
+    if not projection:
+        return _copy(doc)
+    
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for path in include:
+            value = _get(doc, path)
+            if value is not _MISSING:
+                _set(result, path, _copy(value))
+        return result
+    
+    result = _copy(doc)
+    for path, flag in projection.items():
+        if not flag:
+            _unset(result, path)
+    return result
+
+
+# --- Updates ---
+
+def _apply_update(doc: dict, update: dict, inserting: bool = False):
+    """Apply update operators to a document in place."""
+    for op, fields in update.items():
+        if op == "$set":
+            for path, value in fields.items():
+                _set(doc, path, _copy(value))
+        elif op == "$setOnInsert":
+            if inserting:
+                for path, value in fields.items():
+                    _set(doc, path, _copy(value))
+        elif op == "$inc":
+            for path, amount in fields.items():
+                current = _get(doc, path)
+                _set(doc, path, (0 if current is _MISSING or current is None else current) + amount)
+        elif op == "$unset":
+            for path in fields:
+                _unset(doc, path)
+        elif op == "$push":
+            for path, value in fields.items():
+                current = _get(doc, path)
+                items = list(current) if isinstance(current, list) else []
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(_copy(value["$each"]))
+                else:
+                    items.append(_copy(value))
+                _set(doc, path, items)
+        elif op == "$currentDate":
+            for path in fields:
+                _set(doc, path, datetime.utcnow())
+        else:
+            raise OperationFailure(f"Unsupported update operator: {op}")
+
+
+def _upsert_seed(query: dict) -> dict:
+    """Equality fields of a filter become fields of an upserted document."""
+    seed = {}
+    for key, condition in query.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(condition, dict) and condition and next(iter(condition)).startswith("$"):
+            continue
+        _set(seed, key, _copy(condition))
+    return seed
+
+
+# --- Cursor ---
+
+class MemoryCursor:
+    """Lazy cursor supporting sort/skip/limit and async iteration."""
+    
+    def __init__(self, collection: "MemoryCollection", query: Optional[dict], projection: Optional[dict]):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[Iterable[dict]] = None
+    
+    def sort(self, key_or_list, direction: int = 1) -> "MemoryCursor":
+        if isinstance(key_or_list, str):
+            self._sort = [(key_or_list, direction)]
+        else:
+            self._sort = list(key_or_list)
+        return self
+    
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+    
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+    
+    def batch_size(self, size: int) -> "MemoryCursor":
+        return self
+    
+    def _execute(self) -> Iterable[dict]:
+        stop = self._skip + self._limit if self._limit else None
+        docs = self._collection._scan(self._query, self._sort, stop)[self._skip:stop]
+        return (_project(doc, self._projection) for doc in docs)
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> dict:
+        if self._results is None:
+            self._results = iter(self._execute())
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+    
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        docs = self._execute()
+        if length:
+            docs = itertools.islice(docs, length)
+        return list(docs)
+
+
+class MemoryResultCursor:
+    """Cursor over precomputed documents (aggregation results)."""
+    
+    def __init__(self, docs: List[dict]):
+        self._docs = iter(docs)
+    
+    def batch_size(self, size: int) -> "MemoryResultCursor":
+        return self
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> dict:
+        try:
+            return next(self._docs)
+        except StopIteration:
+            raise StopAsyncIteration
+    
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        return list(itertools.islice(self._docs, length) if length else self._docs)
+
+
+# --- Aggregation ---
+
+def _expression(doc: dict, expr: Any) -> Any:
+    """Evaluate a "$field" path or a literal."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = _get(doc, expr[1:])
+        return None if value is _MISSING else value
+    return expr
+
+
+def _group(docs: List[dict], spec: dict) -> List[dict]:
+    """$group with $sum/$first/$max/$min accumulators."""
+    groups: Dict[Any, dict] = {}
+    for doc in docs:
+        key = _expression(doc, spec["_id"])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {"_id": key}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, expr), = accumulator.items()
+            value = _expression(doc, expr)
+            if op == "$sum":
+                group[field] = group.get(field, 0) + (value if isinstance(value, (int, float)) else 0)
+            elif op == "$first":
+                group.setdefault(field, value)
+            elif op in ("$max", "$min") and value is not None:
+                current = group.get(field)
+                if current is None or (value > current if op == "$max" else value < current):
+                    group[field] = value
+            else:
+                raise OperationFailure(f"Unsupported accumulator: {op}")
+    return list(groups.values())
+
+
+def aggregate_documents(docs: List[dict], pipeline: List[dict]) -> List[dict]:
+    """Run $match/$unwind/$group/$sort/$skip/$limit/$project stages over documents."""
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$match":
+            docs = [doc for doc in docs if matches(doc, spec)]
+        elif op == "$unwind":
+            path = (spec["path"] if isinstance(spec, dict) else spec)[1:]
+            unwound = []
+            for doc in docs:
+                values = _get(doc, path)
+                if isinstance(values, list):
+                    for value in values:
+                        item = dict(doc)
+                        _set(item, path, value)
+                        unwound.append(item)
+            docs = unwound
+        elif op == "$group":
+            docs = _group(docs, spec)
+        elif op == "$sort":
+            for key, direction in reversed(list(spec.items())):
+                docs.sort(key=lambda d: _sort_key(_get(d, key)), reverse=direction < 0)
+        elif op == "$skip":
+            docs = docs[spec:]
+        elif op == "$limit":
+            docs = docs[:spec]
+        elif op == "$project":
+            docs = [_project(doc, spec) for doc in docs]
+        else:
+            raise OperationFailure(f"Unsupported aggregation stage: {op}")
+    return docs
+
+
+# --- Collection ---
+
+class MemoryCollection:
+    """A single in-memory collection with hash and sorted indexes."""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[Any, dict] = {}
+        self._hash: Dict[str, Dict[Any, set]] = {field: defaultdict(set) for field in HASH_INDEXED_FIELDS}
+        self._sorted_field = SORTED_INDEXED_FIELDS.get(name)
+        self._sorted: List[Tuple[Any, int, Any]] = []  # (sort key, insertion seq, _id)
+        self._seq = itertools.count()
+        self._doc_seq: Dict[Any, int] = {}
+    
+    # Index maintenance
+    
+    def _index(self, doc: dict):
+        for field, index in self._hash.items():
+            value = doc.get(field)
+            if isinstance(value, str):
+                index[value].add(doc["_id"])
+        if self._sorted_field:
+            value = _get(doc, self._sorted_field)
+            if value is not _MISSING:
+                bisect.insort(self._sorted, (_sort_key(value), self._doc_seq[doc["_id"]], doc["_id"]))
+    
+    def _unindex(self, doc: dict):
+        for field, index in self._hash.items():
+            value = doc.get(field)
+            if isinstance(value, str):
+                index[value].discard(doc["_id"])
+                if not index[value]:
+                    del index[value]
+        if self._sorted_field:
+            value = _get(doc, self._sorted_field)
+            if value is not _MISSING:
+                entry = (_sort_key(value), self._doc_seq[doc["_id"]], doc["_id"])
+                position = bisect.bisect_left(self._sorted, entry)
+                if position < len(self._sorted) and self._sorted[position] == entry:
+                    del self._sorted[position]
+    
+    def _candidates(self, query: dict) -> Iterable[dict]:
+        """Pick the narrowest index for the query, falling back to a full scan."""
+        for field, index in self._hash.items():
+            value = query.get(field)
+            if isinstance(value, str):
+                ids = index.get(value, ())
+                return [self._docs[i] for i in sorted(ids, key=self._doc_seq.__getitem__)]
+        
+        condition = query.get(self._sorted_field) if self._sorted_field else None
+        if isinstance(condition, dict) and any(op in condition for op in ("$gt", "$gte", "$lt", "$lte")):
+            low = bisect.bisect_left(self._sorted, (_sort_key(condition["$gte"]),)) if "$gte" in condition else 0
+            return (self._docs[doc_id] for _, _, doc_id in self._sorted[low:])
+        
+        return list(self._docs.values())
+    
+    def _scan(self, query: dict, sort: List[Tuple[str, int]], limit: Optional[int] = None) -> List[dict]:
+        """
+        Return stored documents matching the query in the requested order.
+        The result is a snapshot, so callers may write while iterating it.
+        """
+        if sort == [(self._sorted_field, 1)] or sort == [(self._sorted_field, -1)]:
+            # Walk the sorted index instead of sorting the result
+            entries = self._sorted if sort[0][1] == 1 else reversed(self._sorted)
+            hash_ids = None
+            for field, index in self._hash.items():
+                if isinstance(query.get(field), str):
+                    hash_ids = index.get(query[field], set())
+            docs = []
+            for _, _, doc_id in entries:
+                if hash_ids is not None and doc_id not in hash_ids:
+                    continue
+                doc = self._docs[doc_id]
+                if matches(doc, query):
+                    docs.append(doc)
+                    if limit and len(docs) >= limit:
+                        break
+            return docs
+        
+        docs = [doc for doc in self._candidates(query) if matches(doc, query)]
+        for key, direction in reversed(sort):
+            docs.sort(key=lambda d: _sort_key(_get(d, key)), reverse=direction < 0)
+        return docs[:limit] if limit else docs
+    
+    def _first(self, query: dict) -> Optional[dict]:
+        if isinstance(query.get("_id"), (ObjectId, str)) and len(query) == 1:
+            return self._docs.get(query["_id"])
+        return next(iter(self._scan(query, [], 1)), None)
+    
+    def _insert(self, doc: dict) -> Any:
+        if "_id" not in doc:
+            doc["_id"] = ObjectId()  # Motor sets _id on the caller's document
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} _id: {doc['_id']}", code=11000,
+            )
+        stored = _copy(doc)
+        self._docs[stored["_id"]] = stored
+        self._doc_seq[stored["_id"]] = next(self._seq)
+        self._index(stored)
+        return stored["_id"]
+    
+    def _update(self, query: dict, update: dict, upsert: bool, many: bool) -> Tuple[int, int, Any]:
+        """Apply an update; returns (matched, modified, upserted_id)."""
+        targets = self._scan(query, []) if many else [d for d in [self._first(query)] if d]
+        for doc in targets:
+            doc_id = doc["_id"]
+            self._unindex(doc)
+            _apply_update(doc, update)
+            doc["_id"] = doc_id  # _id is immutable
+            self._index(doc)
+        
+        if targets or not upsert:
+            return len(targets), len(targets), None
+        
+        doc = _upsert_seed(query)
+        _apply_update(doc, update, inserting=True)
+        return 0, 0, self._insert(doc)
+    
+    def _delete(self, query: dict, many: bool) -> int:
+        targets = self._scan(query, []) if many else [d for d in [self._first(query)] if d]
+        for doc in targets:
+            self._unindex(doc)
+            del self._docs[doc["_id"]]
+            del self._doc_seq[doc["_id"]]
+        return len(targets)
+    
+    # Motor API
+    
+    def find(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(self, filter, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("skip"):
+            cursor.skip(kwargs["skip"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+    
+    async def find_one(self, filter: Optional[dict] = None, projection: Optional[dict] = None, **kwargs) -> Optional[dict]:
+        doc = self._first(filter or {})
+        return _project(doc, projection) if doc else None
+    
+    async def insert_one(self, document: dict, **kwargs) -> InsertOneResult:
+        return InsertOneResult(self._insert(document), acknowledged=True)
+    
+    async def insert_many(self, documents: List[dict], ordered: bool = True, **kwargs) -> InsertManyResult:
+        ids = []
+        errors = []
+        for index, doc in enumerate(documents):
+            try:
+                ids.append(self._insert(doc))
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(ids)})
+        return InsertManyResult(ids, acknowledged=True)
+    
+    async def update_one(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        matched, modified, upserted_id = self._update(filter, update, upsert, many=False)
+        raw = {"n": matched or int(upserted_id is not None), "nModified": modified}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, acknowledged=True)
+    
+    async def update_many(self, filter: dict, update: dict, upsert: bool = False, **kwargs) -> UpdateResult:
+        matched, modified, upserted_id = self._update(filter, update, upsert, many=True)
+        raw = {"n": matched or int(upserted_id is not None), "nModified": modified}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, acknowledged=True)
+    
+    async def find_one_and_update(
+        self,
+        filter: dict,
+        update: dict,
+        projection: Optional[dict] = None,
+        return_document: bool = ReturnDocument.BEFORE,
+        upsert: bool = False,
+        **kwargs,
+    ) -> Optional[dict]:
+        doc = self._first(filter)
+        if doc is None:
+            if not upsert:
+                return None
+            _, _, upserted_id = self._update(filter, update, upsert=True, many=False)
+            if return_document == ReturnDocument.BEFORE:
+                return None
+            return _project(self._docs[upserted_id], projection)
+        
+        before = _project(doc, projection)
+        self._update({"_id": doc["_id"]}, update, upsert=False, many=False)
+        if return_document == ReturnDocument.BEFORE:
+            return before
+        return _project(doc, projection)
+    
+    async def find_one_and_delete(self, filter: dict, projection: Optional[dict] = None, **kwargs) -> Optional[dict]:
+        doc = self._first(filter)
+        if doc is None:
+            return None
+        result = _project(doc, projection)
+        self._delete({"_id": doc["_id"]}, many=False)
+        return result
+    
+    async def delete_one(self, filter: dict, **kwargs) -> DeleteResult:
+        return DeleteResult({"n": self._delete(filter, many=False)}, acknowledged=True)
+    
+    async def delete_many(self, filter: dict, **kwargs) -> DeleteResult:
+        return DeleteResult({"n": self._delete(filter, many=True)}, acknowledged=True)
+    
+    async def count_documents(self, filter: dict, limit: int = 0, **kwargs) -> int:
+        count = len(self._scan(filter, []))
+        return min(count, limit) if limit else count
+    
+    async def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs) -> BulkWriteResult:
+        """Apply pymongo InsertOne/UpdateOne/UpdateMany/DeleteOne/DeleteMany requests."""
+        result = {
+            "writeErrors": [], "nInserted": 0, "nMatched": 0,
+            "nModified": 0, "nRemoved": 0, "nUpserted": 0, "upserted": [],
+        }
+        for index, request in enumerate(requests):
+            kind = type(request).__name__
+            try:
+                if kind == "InsertOne":
+                    self._insert(request._doc)
+                    result["nInserted"] += 1
+                elif kind in ("UpdateOne", "UpdateMany"):
+                    matched, modified, upserted_id = self._update(
+                        request._filter, request._doc, bool(request._upsert), many=kind == "UpdateMany",
+                    )
+                    result["nMatched"] += matched
+                    result["nModified"] += modified
+                    if upserted_id is not None:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": upserted_id})
+                elif kind in ("DeleteOne", "DeleteMany"):
+                    result["nRemoved"] += self._delete(request._filter, many=kind == "DeleteMany")
+                else:
+                    raise OperationFailure(f"Unsupported bulk operation: {kind}")
+            except (DuplicateKeyError, OperationFailure) as e:
+                result["writeErrors"].append({"index": index, "code": e.code or 2, "errmsg": str(e)})
+                if ordered:
+                    break
+        
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, acknowledged=True)
+    
+    def aggregate(self, pipeline: List[dict], **kwargs) -> MemoryResultCursor:
+        """Aggregate; a leading $match uses the indexes like find() does."""
+        pipeline = list(pipeline)
+        query = pipeline.pop(0)["$match"] if pipeline and "$match" in pipeline[0] else {}
+        return MemoryResultCursor(aggregate_documents(self._scan(query, []), pipeline))
+    
+    async def create_index(self, keys: Any, **kwargs) -> str:
+        """Indexes are fixed (see module docstring); accept and ignore others."""
+        if isinstance(keys, str):
+            return f"{keys}_1"
+        return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+# --- Database ---
+
+class MemoryDatabase:
+    """Dictionary of in-memory collections with Motor-style attribute access."""
+    
+    def __init__(self, name: str = "memory"):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+    
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+    
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+    
+    def watch(self, *args, **kwargs):
+        # Same failure a standalone mongod reports; the change feed falls back
+        raise OperationFailure(
+            "Change streams are not supported by the in-memory backend", code=40573,
+        )
+    
+    async def command(self, command: Any, *args, **kwargs) -> dict:
+        if command == "ping":
+            return {"ok": 1.0}
+        raise OperationFailure(f"Unsupported command: {command}")
@@ -0,0 +1,160 @@
+"""
+Metrics - Prometheus instrumentation for HTTP routes, MongoDB commands and LLM calls.
+Set PROMETHEUS_MULTIPROC_DIR (an empty directory, shared by all workers) when
+running several uvicorn workers; /metrics then aggregates every worker's
+samples instead of reporting whichever worker answered the scrape.
+"""
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Latency buckets from fast Mongo reads up to slow LLM completions
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"],
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"],
+    buckets=BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served", ["method"],
+    multiprocess_mode="livesum",
+)
+
+MONGO_COMMANDS = Counter(
+    "mongo_commands_total", "MongoDB commands", ["collection", "command", "outcome"],
+)
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ["collection", "command"],
+    buckets=BUCKETS,
+)
+
+LLM_REQUESTS = Counter(
+    "llm_requests_total", "LLM completion requests", ["agent", "outcome"],
+)
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "LLM completion latency (excluding queueing)", ["agent"],
+    buckets=BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens reported by the LLM provider", ["agent", "kind"],
+)
+LLM_IN_PROGRESS = Gauge(
+    "llm_requests_in_progress", "LLM requests in flight", multiprocess_mode="livesum",
+)
+LLM_WAITING = Gauge(
+    "llm_requests_waiting", "LLM requests queued for a concurrency slot",
+    multiprocess_mode="livesum",
+)
+
+TICKET_SPLITS = Counter(
+    "ticket_splits_total", "Ticket split results by how they were obtained", ["outcome"],
+)
+
+
+class MetricsMiddleware:
+    """Records latency, count and in-flight requests per route template."""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        method = scope["method"]
+        status = 500
+        
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        HTTP_IN_PROGRESS.labels(method).inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_PROGRESS.labels(method).dec()
+            # Label by template (/projects/{project_id}/tasks), not by raw path
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            HTTP_LATENCY.labels(method, template, status).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, template, status).inc()
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """pymongo command monitoring: latency and outcome per collection and command."""
+    
+    def __init__(self):
+        self._targets: Dict[Tuple[object, int], Tuple[str, str]] = {}
+    
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get(event.command_name)
+        if not isinstance(target, str):
+            # getMore carries the cursor ID; the collection is a separate field
+            target = event.command.get("collection", "")
+        self._targets[(event.connection_id, event.request_id)] = (target, event.command_name)
+    
+    def _finish(self, event, outcome: str) -> None:
+        collection, command = self._targets.pop(
+            (event.connection_id, event.request_id), ("", event.command_name),
+        )
+        MONGO_LATENCY.labels(collection, command).observe(event.duration_micros / 1e6)
+        MONGO_COMMANDS.labels(collection, command, outcome).inc()
+    
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, "ok")
+    
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, "error")
+
+
+def record_llm_call(agent: Optional[str], seconds: float, error: bool) -> None:
+    """Count one LLM request and its latency."""
+    agent = agent or "unknown"
+    LLM_LATENCY.labels(agent).observe(seconds)
+    LLM_REQUESTS.labels(agent, "error" if error else "ok").inc()
+
+
+def record_llm_tokens(agent: Optional[str], usage: dict) -> None:
+    """Count the tokens in a chat completion `usage` block."""
+    agent = agent or "unknown"
+    details = usage.get("prompt_tokens_details") or {}
+    LLM_TOKENS.labels(agent, "prompt").inc(usage.get("prompt_tokens") or 0)
+    LLM_TOKENS.labels(agent, "cached").inc(details.get("cached_tokens") or 0)
+    LLM_TOKENS.labels(agent, "completion").inc(usage.get("completion_tokens") or 0)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition-format body and content type for /metrics."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_exit() -> None:
+    """Drop this worker's live gauges from the multiprocess aggregate."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,311 @@
+"""
+Request Profiler - Opt-in profiling of a single request for debugging hotspots.
+Send `X-Profile: 1` (or `?profile=1`) to run the request under a sampling
+profiler and cProfile. Off unless PROFILING_ENABLED is set; then allowed
+outside production, or in production with the admin token.
+The results are stored under PROFILE_DIR and named in the X-Profile-Id
+response header:
+  <id>.folded  sampled stacks in folded format (flamegraph.pl, speedscope)
+  <id>.prof    cProfile stats (pstats, snakeviz)
+  <id>.txt     per-function timings, by cumulative time
+Both profilers only run while the request's own tasks (the request and any
+task it creates) execute on the event loop, so concurrent requests on the
+same worker are left out.
+"""
+import asyncio
+import contextvars
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from collections.abc import Coroutine
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+PROFILE_MODES = ("all", "sample", "cprofile")
+PROFILE_FILE_RE = re.compile(r"^[\w-]+\.(folded|prof|txt)$")
+
+# cProfile is per-interpreter state; profile one request at a time
+_active = threading.Lock()
+
+# The profile of the request a task belongs to; tasks created while it is
+# set are traced too (see RequestProfile.task_factory)
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+def profile_dir() -> str:
+    return settings.profile_dir or os.path.join(tempfile.gettempdir(), "typeshii-profiles")
+
+
+def profiling_allowed(headers: Headers) -> bool:
+    """
+    Profiling must be enabled; it is then open outside production, and in
+    production it needs the admin token.
+    """
+    if not settings.profiling_enabled:
+        return False
+    if settings.environment.lower() != "production":
+        return True
+    token = headers.get("x-admin-token", "")
+    return bool(settings.admin_token) and hmac.compare_digest(token, settings.admin_token)
+
+
+def requested_mode(scope: Scope, headers: Headers) -> Optional[str]:
+    """The profile mode asked for by the X-Profile header or profile query flag."""
+    value = headers.get("x-profile")
+    if value is None:
+        values = parse_qs(scope.get("query_string", b"").decode()).get("profile")
+        value = values[0] if values else None
+    if value is None or value.lower() in ("", "0", "false"):
+        return None
+    value = value.lower()
+    return value if value in PROFILE_MODES else "all"
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if "site-packages" in filename:
+        filename = filename.rsplit("site-packages" + os.sep, 1)[-1]
+    else:
+        filename = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack at a fixed interval into folded-stack
+    counts. `step` returns the current traced step number, or None while
+    untraced code runs; a sample is kept only if the same step was running
+    before and after the stack was read.
+    """
+    
+    def __init__(self, thread_id: int, interval: float, step: Callable[[], Optional[int]]):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.step = step
+        self.samples: Counter = Counter()
+        self._done = threading.Event()
+        self._labels: Dict[object, str] = {}
+    
+    def run(self) -> None:
+        # The loop thread only yields the GIL mid-step after the switch
+        # interval; shorten it so short steps get sampled too
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, self.interval / 2))
+        try:
+            self._sample()
+        finally:
+            sys.setswitchinterval(switch_interval)
+    
+    def _sample(self) -> None:
+        while not self._done.wait(self.interval):
+            step = self.step()
+            if step is None:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack and self.step() == step:
+                self.samples[";".join(reversed(stack))] += 1
+    
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+    
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class _Traced(Coroutine):
+    """Wraps a coroutine so each of its steps runs with the profilers on."""
+    
+    __slots__ = ("_coro", "_profile")
+    
+    def __init__(self, coro, profile: "RequestProfile"):
+        self._coro = coro
+        self._profile = profile
+    
+    def send(self, value):
+        self._profile.resume()
+        try:
+            return self._coro.send(value)
+        finally:
+            self._profile.pause()
+    
+    def throw(self, *args):
+        self._profile.resume()
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._profile.pause()
+    
+    def close(self):
+        self._coro.close()
+    
+    def __await__(self):
+        return self
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        return self.send(None)
+
+
+class RequestProfile:
+    """
+    Profilers for one request's tasks on the event loop thread. They are
+    switched on for each step of a traced coroutine and off in between,
+    so other requests' tasks are not recorded.
+    """
+    
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.profile_id = time.strftime("%Y%m%d-%H%M%S-") + os.urandom(3).hex()
+        self.sampler: Optional[StackSampler] = None
+        self.profiler: Optional[cProfile.Profile] = None
+        self._steps = 0
+        self._depth = 0
+        self._previous_factory = None
+    
+    def current_step(self) -> Optional[int]:
+        return self._steps if self._depth else None
+    
+    def resume(self) -> None:
+        self._depth += 1
+        if self._depth == 1:
+            self._steps += 1
+            if self.profiler is not None:
+                self.profiler.enable()
+    
+    def pause(self) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self.profiler is not None:
+            self.profiler.disable()
+    
+    def task_factory(self, loop, coro, **kwargs):
+        """Trace tasks created from this request's tasks."""
+        if _current_profile.get() is self:
+            coro = _Traced(coro, self)
+        if self._previous_factory is not None:
+            return self._previous_factory(loop, coro, **kwargs)
+        return asyncio.Task(coro, loop=loop, **kwargs)
+    
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._previous_factory = loop.get_task_factory()
+        loop.set_task_factory(self.task_factory)
+        if self.mode in ("all", "sample"):
+            self.sampler = StackSampler(
+                threading.get_ident(), settings.profile_interval_ms / 1000, self.current_step,
+            )
+            self.sampler.start()
+        if self.mode in ("all", "cprofile"):
+            self.profiler = cProfile.Profile()
+    
+    def stop(self) -> None:
+        asyncio.get_running_loop().set_task_factory(self._previous_factory)
+        if self.sampler is not None:
+            self.sampler.stop()
+    
+    def save(self, label: str) -> None:
+        """Write the profile files (blocking; run it in an executor)."""
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.profile_id)
+        if self.sampler is not None:
+            with open(f"{base}.folded", "w") as f:
+                f.write(self.sampler.folded())
+        if self.profiler is not None:
+            self.profiler.dump_stats(f"{base}.prof")
+            out = io.StringIO()
+            out.write(f"{label}\n\n")
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(60)
+            with open(f"{base}.txt", "w") as f:
+                f.write(out.getvalue())
+        _prune(directory)
+
+
+def _prune(directory: str) -> None:
+    """Keep only the newest PROFILE_KEEP profiles."""
+    ids = sorted({name.rsplit(".", 1)[0] for name in os.listdir(directory) if PROFILE_FILE_RE.match(name)})
+    for stale in ids[:max(len(ids) - settings.profile_keep, 0)]:
+        for ext in ("folded", "prof", "txt"):
+            try:
+                os.remove(os.path.join(directory, f"{stale}.{ext}"))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilerMiddleware:
+    """Runs flagged requests under RequestProfile (see the module docstring)."""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        headers = Headers(scope=scope)
+        mode = requested_mode(scope, headers)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        
+        if not profiling_allowed(headers):
+            response = JSONResponse({"detail": "Profiling not allowed"}, status_code=403)
+            await response(scope, receive, send)
+            return
+        if not _active.acquire(blocking=False):
+            response = JSONResponse({"detail": "Another request is being profiled"}, status_code=409)
+            await response(scope, receive, send)
+            return
+        
+        profile = RequestProfile(mode)
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profile.profile_id)
+            await send(message)
+        
+        try:
+            profile.start()
+            token = _current_profile.set(profile)
+            try:
+                await _Traced(self.app(scope, receive, send_wrapper), profile)
+            finally:
+                _current_profile.reset(token)
+                profile.stop()
+            label = f"{scope['method']} {scope['path']}"
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, profile.save, label)
+            except OSError as e:
+                print(f"Failed to save profile {profile.profile_id}: {e}")
+        finally:
+            _active.release()
@@ -0,0 +1,73 @@
+"""
+Project Revisions - Per-project change counter for conditional GETs.
+Every write bumps the owning project's revision, so ETags on the state and
+list endpoints can be validated with a single _id lookup.
+These ETags are cache validators for If-None-Match only; conditional updates
+use the document version in X-Version (see app.core.versioning).
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Iterable, Optional
+
+from bson import ObjectId
+from fastapi import Request, Response
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+REVISION_PROJECTION = {"revision": 1, "revised_at": 1, "updated_at": 1}
+
+
+def revision_update() -> dict:
+    """Update operators that bump a project's revision."""
+    return {"$inc": {"revision": 1}, "$set": {"revised_at": datetime.utcnow()}}
+
+
+async def bump_revision(db: AsyncIOMotorDatabase, project_id: str):
+    """Record that something in the project changed."""
+    if ObjectId.is_valid(project_id):
+        await db.projects.update_one({"_id": ObjectId(project_id)}, revision_update())
+
+
+async def bump_revisions(db: AsyncIOMotorDatabase, project_ids: Iterable[str]):
+    """Bump several projects' revisions in one round trip."""
+    ids = [ObjectId(pid) for pid in set(project_ids) if ObjectId.is_valid(pid)]
+    if ids:
+        await db.projects.update_many({"_id": {"$in": ids}}, revision_update())
+
+
+async def get_revision(db: AsyncIOMotorDatabase, project_id: str) -> Optional[dict]:
+    """Fetch only the revision fields of a project."""
+    return await db.projects.find_one({"_id": ObjectId(project_id)}, REVISION_PROJECTION)
+
+
+def revision_headers(request: Request, project: dict) -> dict:
+    """
+    Build ETag/Last-Modified headers from the project's revision.
+    The ETag also covers the request path and query, so filtered list views
+    get their own validators. It is sent back in If-None-Match, never in
+    If-Match (updates take X-Version).
+    """
+    variant = hashlib.md5(str(request.url.path).encode() + b"?" + request.url.query.encode()).hexdigest()[:8]
+    headers = {
+        "ETag": f'W/"{project["_id"]}-{project.get("revision", 0)}-{variant}"',
+        "Cache-Control": "no-cache",
+    }
+    
+    modified = project.get("revised_at") or project.get("updated_at")
+    if isinstance(modified, datetime):
+        headers["Last-Modified"] = format_datetime(modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def not_modified(request: Request, headers: dict) -> Optional[Response]:
+    """Return a 304 response if If-None-Match matches the current ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    
+    etag = headers["ETag"]
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    # Weak comparison: W/"x" and "x" match
+    if "*" in candidates or etag in candidates or etag[2:] in candidates:
+        return Response(status_code=304, headers=headers)
+    return None
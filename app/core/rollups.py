@@ -0,0 +1,78 @@
+"""
+Event Rollups - Daily per-project counters derived from the audit trail.
+Gives agents a compact, long-window view of velocity while raw events age out.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+# Event type -> rollup counter name
+EVENT_METRICS = {
+    "task_created": "created",
+    "task_completed": "completed",
+    "task_blocked": "blocked",
+    "task_updated": "updated",
+}
+
+
+def _field_key(value: str) -> str:
+    """Make an arbitrary value safe to use as a document field name."""
+    return str(value).replace(".", "_").lstrip("$") or "unknown"
+
+
+def build_rollup_updates(events: List[dict]) -> List[UpdateOne]:
+    """Fold a batch of events into one upsert per project and day."""
+    increments: Dict[tuple, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    
+    for event in events:
+        project_id = event.get("project_id")
+        timestamp = event.get("timestamp")
+        if not project_id or not isinstance(timestamp, datetime):
+            continue
+        
+        event_type = event.get("event_type", "")
+        metric = EVENT_METRICS.get(event_type, event_type)
+        details = event.get("details") or {}
+        inc = increments[(project_id, timestamp.strftime("%Y-%m-%d"))]
+        
+        inc[f"counts.{metric}"] += 1
+        status = details.get("new_status") or details.get("status")
+        if status:
+            inc[f"by_status.{_field_key(status)}"] += 1
+        assignee = details.get("assignee_id")
+        if assignee:
+            inc[f"by_assignee.{_field_key(assignee)}.{metric}"] += 1
+    
+    return [
+        UpdateOne(
+            {"_id": f"{project_id}:{day}"},
+            {
+                "$inc": dict(inc),
+                "$setOnInsert": {"project_id": project_id, "date": day},
+            },
+            upsert=True,
+        )
+        for (project_id, day), inc in increments.items()
+    ]
+
+
+async def apply_rollups(db: AsyncIOMotorDatabase, events: List[dict]):
+    """Incrementally update daily rollups for a batch of persisted events."""
+    updates = build_rollup_updates(events)
+    if updates:
+        await db.event_rollups.bulk_write(updates, ordered=False)
+
+
+async def load_rollups(db: AsyncIOMotorDatabase, project_id: str, days: int) -> List[dict]:
+    """Fetch a project's daily rollups for the last `days` days, oldest first."""
+    start = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+    rollups = []
+    async for doc in db.event_rollups.find(
+        {"project_id": project_id, "date": {"$gte": start}},
+        {"_id": 0, "project_id": 0},
+    ).sort("date", 1):
+        rollups.append(doc)
+    return rollups
@@ -0,0 +1,47 @@
+"""
+Fast JSON serialization - orjson-backed responses for large payloads.
+Handles ObjectId, datetime, enums and Pydantic models natively, so routes
+can return Mongo documents without per-document conversion loops.
+"""
+from typing import Any, AsyncIterator
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.core.tracing import span
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any):
+    """Fallback for types orjson doesn't know."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes."""
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+async def ndjson_rows(cursor) -> AsyncIterator[bytes]:
+    """Stream a Motor cursor as newline-delimited JSON, one document per line."""
+    async for doc in cursor:
+        yield dumps(doc) + b"\n"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, accepting raw Mongo documents."""
+    
+    media_type = "application/json"
+    
+    def render(self, content: Any) -> bytes:
+        with span("serialize"):
+            return dumps(content)
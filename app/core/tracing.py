@@ -0,0 +1,182 @@
+"""
+Tracing - Lightweight per-request spans reported as Server-Timing.
+Spans are tracked through a contextvar, so concurrent agents (asyncio tasks)
+nest under the span that started them. Each response gets a Server-Timing
+header summing span time by name; with TRACE_FILE set, every trace is also
+appended to that file as one line of OTLP/JSON (the OpenTelemetry file
+exporter format), readable without a collector.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+NON_TOKEN_RE = re.compile(r"[^A-Za-z0-9!#$%&'*+.^_`|~-]")
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+
+class Span:
+    """One timed operation within a trace."""
+    
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+    
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+    
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """The spans recorded while serving one request."""
+    
+    __slots__ = ("trace_id", "root", "spans")
+    
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(name, None, attributes)
+        self.spans: List[Span] = []
+    
+    def server_timing(self) -> str:
+        """Server-Timing header value: total time per span name, plus the request total."""
+        totals: Dict[str, List[float]] = {}
+        for s in self.spans:
+            entry = totals.setdefault(s.name, [0.0, 0])
+            entry[0] += s.duration_ms
+            entry[1] += 1
+        parts = []
+        for name, (duration, count) in totals.items():
+            desc = f';desc="{count} calls"' if count > 1 else ""
+            parts.append(f"{NON_TOKEN_RE.sub('_', name)};dur={duration:.1f}{desc}")
+        parts.append(f"total;dur={(time.time_ns() - self.root.start_ns) / 1e6:.1f}")
+        return ", ".join(parts)
+    
+    def to_otlp(self) -> dict:
+        """The trace as an OTLP/JSON ExportTraceServiceRequest."""
+        def encode(s: Span, kind: int) -> dict:
+            span = {
+                "traceId": self.trace_id,
+                "spanId": s.span_id,
+                "name": s.name,
+                "kind": kind,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "attributes": [
+                    {"key": key, "value": _otlp_value(value)} for key, value in s.attributes.items()
+                ],
+            }
+            if s.parent_id:
+                span["parentSpanId"] = s.parent_id
+            return span
+        
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": settings.trace_service_name}},
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [encode(self.root, SPAN_KIND_SERVER)]
+                + [encode(s, SPAN_KIND_INTERNAL) for s in self.spans],
+            }],
+        }]}
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_parent: ContextVar[Optional[str]] = ContextVar("span_parent", default=None)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time a block as a span of the current request's trace (no-op outside one)."""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    
+    s = Span(name, _parent.get() or trace.root.span_id, attributes)
+    token = _parent.set(s.span_id)
+    try:
+        yield s
+    finally:
+        _parent.reset(token)
+        s.end_ns = time.time_ns()
+        trace.spans.append(s)
+
+
+_file_lock = threading.Lock()
+
+
+def _append_trace(path: str, line: bytes) -> None:
+    with _file_lock, open(path, "ab") as f:
+        f.write(line)
+
+
+class TracingMiddleware:
+    """Starts a trace per HTTP request and adds the Server-Timing header."""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        trace = Trace(scope["method"], {"http.method": scope["method"], "url.path": scope["path"]})
+        token = _trace.set(trace)
+        
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                trace.root.attributes["http.status_code"] = message["status"]
+                if settings.server_timing:
+                    # Spans still open (e.g. a stream's body) are not counted
+                    MutableHeaders(scope=message).append("Server-Timing", trace.server_timing())
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            trace.root.end_ns = time.time_ns()
+            route = getattr(scope.get("route"), "path", None)
+            if route:
+                trace.root.name = f"{scope['method']} {route}"
+                trace.root.attributes["http.route"] = route
+            if settings.trace_file:
+                line = orjson.dumps(trace.to_otlp()) + b"\n"
+                try:
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, _append_trace, settings.trace_file, line,
+                    )
+                except OSError as e:
+                    print(f"Failed to write trace to {settings.trace_file}: {e}")
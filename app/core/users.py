@@ -0,0 +1,111 @@
+"""
+User Directory - Cached lookups of user names for assignee resolution.
+Users live in the `users` collection (keyed by user ID string); lookups are
+cached in-process with a TTL, and IDs that resolve to nothing are cached too
+so a dangling assignee does not hit the database on every request.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Fallback users for MVP name resolution (used when the collection has no match)
+MOCK_USERS = {
+    "user_001": {"id": "user_001", "name": "Jay Tech", "role": "Full Stack Dev"},
+    "user_002": {"id": "user_002", "name": "Sarah Chen", "role": "AI Engineer"},
+    "user_003": {"id": "user_003", "name": "Alex Rivier", "role": "PM"},
+    "manager_99": {"id": "manager_99", "name": "Manjesh Prasad", "role": "Senior Manager"},
+    "dev_01": {"id": "dev_01", "name": "Liam Smith", "role": "Senior Dev"},
+    "dev_02": {"id": "dev_02", "name": "Ava Johnson", "role": "Backend Dev"},
+    "designer_01": {"id": "designer_01", "name": "Noah Miller", "role": "UX Designer"},
+    "qa_01": {"id": "qa_01", "name": "Isabella Brown", "role": "QA Analyst"},
+}
+
+USER_FIELDS = {"name": 1, "role": 1}
+
+
+def user_from_document(doc: dict) -> dict:
+    """API shape of a users collection document."""
+    return {"id": str(doc["_id"]), "name": doc.get("name"), "role": doc.get("role")}
+
+
+class UserDirectory:
+    """
+    Resolves user IDs to {"id", "name", "role"}.
+    
+    Cache misses for a whole batch are fetched with one $in query. Found
+    users are cached for USER_CACHE_TTL_SECONDS, unknown IDs for
+    USER_CACHE_NEGATIVE_TTL_SECONDS; the least recently used entries are
+    evicted beyond USER_CACHE_SIZE.
+    """
+    
+    def __init__(self):
+        self._cache: "OrderedDict[str, Tuple[Optional[dict], float]]" = OrderedDict()
+    
+    async def resolve(self, db: AsyncIOMotorDatabase, user_ids: Iterable[str]) -> Dict[str, dict]:
+        """Users for the given IDs, keyed by ID; unknown IDs are left out."""
+        now = time.monotonic()
+        found: Dict[str, dict] = {}
+        misses: List[str] = []
+        for user_id in dict.fromkeys(user_ids):
+            cached = self._cache.get(user_id)
+            if cached is not None and cached[1] > now:
+                self._cache.move_to_end(user_id)
+                if cached[0] is not None:
+                    found[user_id] = cached[0]
+            else:
+                misses.append(user_id)
+        
+        if not misses:
+            return found
+        
+        try:
+            fetched = {
+                str(doc["_id"]): user_from_document(doc)
+                async for doc in db.users.find({"_id": {"$in": misses}}, USER_FIELDS)
+            }
+        except Exception as e:
+            # Serve the fallback users, but do not cache a failed lookup
+            print(f"User lookup failed: {e}")
+            found.update({uid: MOCK_USERS[uid] for uid in misses if uid in MOCK_USERS})
+            return found
+        
+        for user_id in misses:
+            user = fetched.get(user_id) or MOCK_USERS.get(user_id)
+            ttl = settings.user_cache_ttl_seconds if user else settings.user_cache_negative_ttl_seconds
+            self._cache[user_id] = (user, now + ttl)
+            self._cache.move_to_end(user_id)
+            if user:
+                found[user_id] = user
+        
+        while len(self._cache) > settings.user_cache_size:
+            self._cache.popitem(last=False)
+        return found
+    
+    async def get(self, db: AsyncIOMotorDatabase, user_id: str) -> Optional[dict]:
+        return (await self.resolve(db, [user_id])).get(user_id)
+    
+    async def list_users(self, db: AsyncIOMotorDatabase) -> List[dict]:
+        """All users in the collection, plus fallback users it does not shadow."""
+        users = {
+            user["id"]: user
+            for user in map(user_from_document, await db.users.find({}, USER_FIELDS).to_list(None))
+        }
+        return list(users.values()) + [u for uid, u in MOCK_USERS.items() if uid not in users]
+
+
+# Singleton instance
+_directory: Optional[UserDirectory] = None
+
+
+def get_user_directory() -> UserDirectory:
+    """Get singleton UserDirectory instance."""
+    global _directory
+    if _directory is None:
+        _directory = UserDirectory()
+    return _directory
@@ -0,0 +1,55 @@
+"""
+Optimistic concurrency helpers - Document versions for conditional updates.
+Clients send the version they last read in the X-Version header; a mismatch
+is a 409. ETags are revision-based cache validators (see app.core.revisions)
+and are only used with If-None-Match, so If-Match is not accepted here.
+"""
+from typing import Optional
+from fastapi import HTTPException
+
+VERSION_HEADER = "X-Version"
+
+
+def parse_expected_version(x_version: Optional[str], if_match: Optional[str] = None) -> Optional[int]:
+    """
+    Parse the X-Version header into the expected document version.
+    Returns None when it is absent (no precondition). A conditional If-Match
+    is rejected rather than ignored, so a client relying on it is not
+    silently left without a precondition.
+    """
+    if if_match is not None and if_match.strip() != "*":
+        raise HTTPException(
+            status_code=400,
+            detail=f"If-Match is not supported for updates; send the version in {VERSION_HEADER}",
+        )
+    if x_version is None:
+        return None
+    
+    try:
+        version = int(x_version.strip().strip('"'))
+    except ValueError:
+        version = -1
+    if version < 0:
+        raise HTTPException(status_code=400, detail=f"Invalid {VERSION_HEADER} header")
+    return version
+
+
+def version_filter(expected: int) -> dict:
+    """Query fragment matching a document at the expected version."""
+    if expected == 0:
+        # Documents written before versioning have no version field
+        return {"version": {"$in": [0, None]}}
+    return {"version": expected}
+
+
+async def raise_for_missing(collection, query: dict, expected: Optional[int], entity: str):
+    """
+    Raise the right error after a conditional update matched nothing:
+    409 if the document exists at another version, otherwise 404.
+    """
+    if expected is not None and await collection.count_documents(query, limit=1):
+        raise HTTPException(
+            status_code=409,
+            detail=f"{entity} was modified by another request (version mismatch)",
+        )
+    raise HTTPException(status_code=404, detail=f"{entity} not found")
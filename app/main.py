@@ -2,12 +2,20 @@
 PM Agentic Workflow - Main Application Entry Point
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import get_settings
-from app.core.database import connect_to_mongo, close_mongo_connection, is_db_connected
-from app.routes import projects_router, tasks_router, agents_router, milestones_router, users_router
+from app.core.database import connect_to_mongo, close_mongo_connection, is_db_connected, is_in_memory, get_database
+from app.core.events import get_event_sink
+from app.core.change_feed import get_change_feed
+from app.core.compression import CompressionMiddleware
+from app.core.llm import get_llm_client
+from app.core.metrics import MetricsMiddleware, mark_worker_exit, render_metrics
+from app.core.tracing import TracingMiddleware
+from app.core.profiling import ProfilerMiddleware
+from app.agents.ticket_splitter import get_ticket_splitter
+from app.routes import projects_router, tasks_router, agents_router, milestones_router, users_router, debug_router
 
 settings = get_settings()
 
@@ -17,9 +25,14 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler for startup/shutdown."""
     # Startup
     await connect_to_mongo()
+    await get_event_sink().start()
+    await get_change_feed().start(get_database())
     yield
     # Shutdown
+    await get_change_feed().stop()
+    await get_event_sink().stop()
     await close_mongo_connection()
+    mark_worker_exit()
 
 
 app = FastAPI(
@@ -38,6 +51,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated gzip/brotli for large JSON payloads (state, task lists, analyses)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_size)
+
+# Opt-in per-request profiling (X-Profile header / ?profile=1)
+if settings.profiling_enabled:
+    app.add_middleware(ProfilerMiddleware)
+
+# Outermost, so request latency and traces include compression
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 
 # Health check endpoint
 @app.get("/health")
@@ -46,16 +70,27 @@ async def health_check():
     return {
         "status": "healthy",
         "version": "1.0.0",
-        "database": "connected" if is_db_connected() else "not configured",
+        "database": "connected" if is_db_connected() else "in-memory" if is_in_memory() else "not configured",
+        "llm_usage": get_llm_client().usage_summary(),
+        "ticket_split_outcomes": get_ticket_splitter().outcome_summary(),
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (aggregated across workers in multiprocess mode)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
 # API routes
 app.include_router(projects_router, prefix=settings.api_prefix)
 app.include_router(tasks_router, prefix=settings.api_prefix)
 app.include_router(agents_router, prefix=settings.api_prefix)
 app.include_router(milestones_router, prefix=settings.api_prefix)
 app.include_router(users_router, prefix=settings.api_prefix)
+if settings.profiling_enabled:
+    app.include_router(debug_router, prefix=settings.api_prefix)
 
 
 @app.get("/")
@@ -65,4 +100,5 @@ async def root():
         "message": "PM Agentic Workflow API",
         "docs": "/docs",
         "health": "/health",
+        "metrics": "/metrics",
     }
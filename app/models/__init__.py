@@ -4,6 +4,9 @@ from .schemas import (
     EventType,
     TaskCreate,
     TaskUpdate,
+    TaskBulkCreate,
+    TaskBulkUpdateItem,
+    TaskBulkUpdate,
     TaskInDB,
     RiskCreate,
     RiskInDB,
@@ -24,6 +27,9 @@ __all__ = [
     "EventType",
     "TaskCreate",
     "TaskUpdate",
+    "TaskBulkCreate",
+    "TaskBulkUpdateItem",
+    "TaskBulkUpdate",
     "TaskInDB",
     "RiskCreate",
     "RiskInDB",
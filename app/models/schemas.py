@@ -91,6 +91,21 @@ class TaskUpdate(BaseModel):
     labels: Optional[List[str]] = None
 
 
+class TaskBulkCreate(BaseModel):
+    """Schema for creating many tasks in one request."""
+    tasks: List[TaskCreate] = Field(..., min_length=1)
+
+
+class TaskBulkUpdateItem(TaskUpdate):
+    """A single entry of a bulk task update."""
+    id: str
+
+
+class TaskBulkUpdate(BaseModel):
+    """Schema for updating many tasks in one request."""
+    updates: List[TaskBulkUpdateItem] = Field(..., min_length=1)
+
+
 class TaskInDB(TaskBase, TimestampMixin):
     """Task as stored in database."""
     id: str = Field(alias="_id")
@@ -232,4 +247,5 @@ class AgentOutput(BaseModel):
     status_summary: str
     risks: List[str] = Field(default_factory=list)
     recommendations: List[AgentRecommendation] = Field(default_factory=list)
+    analysis_mode: str = "full"  # "full" or "delta" (only changes since the last run were sent)
     generated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,16 +1,31 @@
 """
 Agents API routes - Trigger agent analysis and ticket splitting.
 """
+import asyncio
 from typing import Optional, List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
 from datetime import datetime
 
+from app.core.config import get_settings
 from app.core.database import get_database
+from app.core.labels import top_labels
+from app.core.rollups import load_rollups
+from app.core.serialization import FastJSONResponse, dumps
+from app.core.events import get_event_sink
+from app.core.revisions import bump_revision
+from app.core.change_feed import get_change_feed
+from app.core.tracing import span
+from app.models import EventType, TaskStatus
 from app.agents import get_orchestrator, AgentOrchestrator
-from app.agents.ticket_splitter import get_ticket_splitter, TicketSplitterAgent
+from app.agents.snapshot import TaskTable
+from app.agents.ticket_splitter import get_ticket_splitter, TicketSplitterAgent, TicketSplitResult
+from app.routes.tasks import build_event
+
+settings = get_settings()
 
 router = APIRouter(prefix="/projects/{project_id}/agents", tags=["agents"])
 
@@ -21,51 +36,83 @@ class SplitTicketRequest(BaseModel):
     context: Optional[str] = None
 
 
-async def get_project_state(project_id: str, db: AsyncIOMotorDatabase) -> dict:
-    """Helper to fetch full project state for agents."""
-    if not ObjectId.is_valid(project_id):
-        raise HTTPException(status_code=400, detail="Invalid project ID")
-    
-    project = await db.projects.find_one({"_id": ObjectId(project_id)})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    project["_id"] = str(project["_id"])
+class SplitTicketBatchRequest(BaseModel):
+    """Request body for splitting many topics in one call."""
+    topics: List[SplitTicketRequest] = Field(..., min_length=1, max_length=100)
+    persist: bool = False  # Create the generated tasks in one bulk write
+
+
+def _projection(fields: List[str]) -> Dict[str, int]:
+    """Build a Mongo inclusion projection from a field list."""
+    return {field: 1 for field in fields}
+
+
+async def get_project_state(
+    project_id: str,
+    db: AsyncIOMotorDatabase,
+    fields: Optional[Dict[str, List[str]]] = None,
+) -> dict:
+    """
+    Helper to fetch project state for agents.
     
-    tasks = []
-    async for doc in db.tasks.find({"project_id": project_id}):
-        doc["_id"] = str(doc["_id"])
-        tasks.append(doc)
+    Tasks, milestones and risks are returned in creation (_id) order so
+    that the formatted state, and with it the prompt prefix the provider
+    caches, is identical between runs on unchanged data.
     
-    milestones = []
-    async for doc in db.milestones.find({"project_id": project_id}):
-        doc["_id"] = str(doc["_id"])
-        milestones.append(doc)
+    `fields` is the orchestrator's field manifest for the agents about to
+    run: each listed section is loaded with a projection on those fields
+    and unlisted sections are skipped. Without it the full state is loaded.
+    """
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
     
-    risks = []
-    async for doc in db.risks.find({"project_id": project_id, "is_resolved": False}):
-        doc["_id"] = str(doc["_id"])
-        risks.append(doc)
+    def wants(section: str) -> bool:
+        return fields is None or section in fields
     
-    yesterday = datetime.utcnow().replace(hour=0, minute=0, second=0)
-    recent_events = []
-    async for doc in db.events.find({
-        "project_id": project_id,
-        "timestamp": {"$gte": yesterday},
-    }).sort("timestamp", -1).limit(50):
-        doc["_id"] = str(doc["_id"])
-        recent_events.append(doc)
+    def projection(section: str) -> Optional[Dict[str, int]]:
+        return None if fields is None else _projection(fields[section])
     
-    return {
-        "project": project,
-        "tasks": tasks,
-        "milestones": milestones,
-        "risks": risks,
-        "recent_events": recent_events,
-    }
+    with span("load_state", project_id=project_id):
+        project = await db.projects.find_one(
+            {"_id": ObjectId(project_id)},
+            projection("project") if wants("project") else {"_id": 1},
+        )
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        state: Dict[str, Any] = {"project": project}
+        
+        if wants("tasks"):
+            # Stream straight into the columnar table rather than holding every
+            # task document; agents and formatters share this one snapshot
+            tasks = TaskTable()
+            cursor = db.tasks.find({"project_id": project_id}, projection("tasks")).sort("_id", 1)
+            async for doc in cursor:
+                tasks.append(doc)
+            state["tasks"] = tasks.finalize()
+        if wants("milestones"):
+            state["milestones"] = await db.milestones.find(
+                {"project_id": project_id}, projection("milestones")
+            ).sort("_id", 1).to_list(None)
+        if wants("risks"):
+            state["risks"] = await db.risks.find(
+                {"project_id": project_id, "is_resolved": False}, projection("risks")
+            ).sort("_id", 1).to_list(None)
+        
+        if wants("recent_events"):
+            yesterday = datetime.utcnow().replace(hour=0, minute=0, second=0)
+            state["recent_events"] = await db.events.find(
+                {"project_id": project_id, "timestamp": {"$gte": yesterday}},
+                projection("recent_events"),
+            ).sort("timestamp", -1).limit(50).to_list(None)
+        
+        if wants("velocity"):
+            state["velocity"] = await load_rollups(db, project_id, settings.velocity_window_days)
+        
+        return state
 
 
-@router.post("/analyze", response_model=dict)
+@router.post("/analyze", response_model=dict, response_class=FastJSONResponse)
 async def run_full_analysis(
     project_id: str,
     db: AsyncIOMotorDatabase = Depends(get_database),
@@ -74,53 +121,19 @@ async def run_full_analysis(
     """
     Run all agents on the project and return comprehensive analysis.
     """
-    project_state = await get_project_state(project_id, db)
+    project_state = await get_project_state(project_id, db, orchestrator.required_fields())
     
     try:
-        results = await orchestrator.run_full_analysis(project_state)
+        results = await orchestrator.run_full_analysis(project_state, db)
         
-        # Convert to serializable format
-        response = {
-            agent_name: {
-                "agent_name": getattr(output, 'agent_name', str(output)),
-                "status_summary": getattr(output, 'status_summary', ''),
-                "risks": getattr(output, 'risks', []),
-                "recommendations": [
-                    {
-                        "title": rec.title,
-                        "priority": rec.priority,
-                        "category": rec.category,
-                        "suggestion": rec.suggestion,
-                        "reasoning": rec.reasoning,
-                        "affected_entities": rec.affected_entities,
-                    }
-                    for rec in getattr(output, 'recommendations', [])
-                ],
-                "generated_at": getattr(output, 'generated_at', datetime.utcnow()).isoformat(),
-            }
-            for agent_name, output in results.items() if agent_name != "insights"
-        }
-        
-        # Add the consolidated insights list for the dashboard panel
-        if "insights" in results:
-            response["insights"] = [
-                {
-                    "title": rec.title,
-                    "priority": rec.priority,
-                    "category": rec.category,
-                    "suggestion": rec.suggestion,
-                    "reasoning": rec.reasoning,
-                    "affected_entities": rec.affected_entities,
-                }
-                for rec in results["insights"]
-            ]
-            
-        return response
+        # AgentOutput/AgentRecommendation models serialize directly;
+        # "insights" is the consolidated list for the dashboard panel
+        return FastJSONResponse(results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Agent analysis failed: {str(e)}")
 
 
-@router.post("/analyze/{agent_name}", response_model=dict)
+@router.post("/analyze/{agent_name}", response_model=dict, response_class=FastJSONResponse)
 async def run_single_agent(
     project_id: str,
     agent_name: str,
@@ -137,28 +150,13 @@ async def run_single_agent(
             detail=f"Invalid agent name. Must be one of: {valid_agents}",
         )
     
-    project_state = await get_project_state(project_id, db)
+    # Load what a full run loads so the shared prompt context (and the
+    # provider's prompt cache prefix) matches /analyze exactly
+    project_state = await get_project_state(project_id, db, orchestrator.required_fields())
     
     try:
-        output = await orchestrator.run_single_agent(agent_name, project_state)
-        
-        return {
-            "agent_name": output.agent_name,
-            "status_summary": output.status_summary,
-            "risks": output.risks,
-            "recommendations": [
-                {
-                    "title": rec.title,
-                    "priority": rec.priority,
-                    "category": rec.category,
-                    "suggestion": rec.suggestion,
-                    "reasoning": rec.reasoning,
-                    "affected_entities": rec.affected_entities,
-                }
-                for rec in output.recommendations
-            ],
-            "generated_at": output.generated_at.isoformat(),
-        }
+        output = await orchestrator.run_single_agent(agent_name, project_state, db)
+        return FastJSONResponse(output)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -172,7 +170,7 @@ async def generate_executive_report(
     orchestrator: AgentOrchestrator = Depends(get_orchestrator),
 ):
     """Generate comprehensive executive report."""
-    project_state = await get_project_state(project_id, db)
+    project_state = await get_project_state(project_id, db, orchestrator.required_fields())
     
     try:
         report = await orchestrator.generate_executive_report(project_state)
@@ -181,38 +179,191 @@ async def generate_executive_report(
         raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
 
 
+async def _split_project_context(project_id: str, db: AsyncIOMotorDatabase) -> dict:
+    """Project name and existing labels given to the ticket splitter."""
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    
+    project = await db.projects.find_one({"_id": ObjectId(project_id)}, {"name": 1, "revision": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    return {
+        "name": project.get("name"),
+        "existing_labels": await top_labels(db, project, 20),
+    }
+
+
+def split_task_documents(project_id: str, result: TicketSplitResult, now: datetime) -> List[dict]:
+    """
+    Task documents (parent first, then subtasks) for a split result, with
+    pre-generated IDs. Subtasks come back in dependency order, so each one
+    depends on the one before it, and the parent depends on all subtasks.
+    """
+    docs = []
+    for item, labels in [(result.parent_task, [])] + [(st, st.labels) for st in result.subtasks]:
+        docs.append({
+            "_id": ObjectId(),
+            "title": item.title[:200],
+            "description": item.description,
+            "status": TaskStatus.PENDING.value,
+            "assignee_id": None,
+            "priority": min(max(item.priority, 1), 5),
+            "due_date": None,
+            "dependencies": [],
+            "labels": list(labels),
+            "milestone_id": None,
+            "project_id": project_id,
+            "created_at": now,
+            "updated_at": now,
+            "version": 1,
+        })
+    
+    subtask_ids = [str(doc["_id"]) for doc in docs[1:]]
+    docs[0]["dependencies"] = subtask_ids
+    for doc, previous in zip(docs[2:], subtask_ids):
+        doc["dependencies"] = [previous]
+    return docs
+
+
+async def persist_split_tasks(project_id: str, docs: List[dict], db: AsyncIOMotorDatabase) -> None:
+    """Insert generated tasks in one write and record their creation."""
+    await db.tasks.insert_many(docs, ordered=False)
+    await bump_revision(db, project_id)
+    
+    events = []
+    for doc in docs:
+        task_id = str(doc["_id"])
+        get_change_feed().notify(project_id, "tasks", "insert", task_id, document=doc)
+        events.append(build_event(
+            project_id, EventType.TASK_CREATED, task_id, "system",
+            {"title": doc["title"], "status": doc["status"], "assignee_id": None},
+        ))
+    await get_event_sink().emit(events, durable=settings.event_durable_writes)
+
+
 @router.post("/split-ticket", response_model=dict)
 async def split_ticket(
     project_id: str,
     request: SplitTicketRequest,
+    persist: bool = Query(False, description="Create the parent task and subtasks"),
     db: AsyncIOMotorDatabase = Depends(get_database),
     splitter: TicketSplitterAgent = Depends(get_ticket_splitter),
 ):
-    """Split a topic into tasks."""
-    if not ObjectId.is_valid(project_id):
-        raise HTTPException(status_code=400, detail="Invalid project ID")
-
-    project = await db.projects.find_one({"_id": ObjectId(project_id)})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-
-    existing_labels = []
-    cursor = db.tasks.find({"project_id": project_id}, {"labels": 1})
-    async for doc in cursor:
-        if "labels" in doc:
-            existing_labels.extend(doc["labels"])
+    """
+    Split a topic into tasks.
     
-    project_context = {
-        "name": project.get("name"),
-        "existing_labels": list(set(existing_labels))[:20]
-    }
+    With persist, the parent and subtasks are created in one bulk write,
+    linked by dependencies, and their IDs returned as "created" (parent first).
+    A fallback breakdown (the LLM failed) is returned but never persisted.
+    """
+    project_context = await _split_project_context(project_id, db)
 
     try:
-        result = await splitter.split_ticket(
+        result, outcome = await splitter.split_ticket_cached(
             topic=request.topic,
             context=request.context,
-            project_context=project_context
+            project_context=project_context,
+            scope=project_id,
         )
-        return result.dict()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ticket splitting failed: {str(e)}")
+    
+    response = {
+        **result.dict(),
+        "cache_hit": outcome == "cache_hit",
+        "fallback": outcome == "fallback",
+    }
+    if persist and outcome == "fallback":
+        response["created"] = []
+    elif persist:
+        docs = split_task_documents(project_id, result, datetime.utcnow())
+        try:
+            await persist_split_tasks(project_id, docs, db)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to create tasks: {str(e)}")
+        response["created"] = [str(doc["_id"]) for doc in docs]
+    return response
+
+
+@router.post("/split-tickets")
+async def split_tickets(
+    project_id: str,
+    request: SplitTicketBatchRequest,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    splitter: TicketSplitterAgent = Depends(get_ticket_splitter),
+):
+    """
+    Split many topics in one call, streamed as NDJSON.
+    
+    The project context is loaded once and the splits run concurrently
+    (bounded by LLM_MAX_CONCURRENCY). Each line is
+    {"index", "topic", "result", "cache_hit", "fallback"} or {"index", "topic",
+    "error"}, in completion order. The last line is a {"summary": ...}; with
+    persist, all generated tasks are created in one bulk write and the
+    summary maps each index to its created task IDs (parent first).
+    Fallback results (the generic breakdown used when the LLM failed) are
+    not persisted; their indexes are listed under "skipped".
+    """
+    project_context = await _split_project_context(project_id, db)
+    
+    async def run(index: int, item: SplitTicketRequest):
+        try:
+            result, outcome = await splitter.split_ticket_cached(
+                topic=item.topic,
+                context=item.context,
+                project_context=project_context,
+                scope=project_id,
+            )
+            return index, result, outcome, None
+        except Exception as e:
+            return index, None, None, str(e)
+    
+    async def stream():
+        pending = [asyncio.create_task(run(i, item)) for i, item in enumerate(request.topics)]
+        results = {}
+        fallbacks = []
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(pending):
+                index, result, outcome, error = await next_done
+                line = {"index": index, "topic": request.topics[index].topic}
+                if error is None:
+                    results[index] = result
+                    if outcome == "fallback":
+                        fallbacks.append(index)
+                    line["result"] = result
+                    line["cache_hit"] = outcome == "cache_hit"
+                    line["fallback"] = outcome == "fallback"
+                else:
+                    failed += 1
+                    line["error"] = f"Ticket splitting failed: {error}"
+                yield dumps(line) + b"\n"
+        finally:
+            # Client went away: stop the remaining LLM calls
+            for task in pending:
+                task.cancel()
+        
+        summary: Dict[str, Any] = {"succeeded": len(results), "failed": failed}
+        if request.persist and fallbacks:
+            summary["skipped"] = sorted(fallbacks)
+        # Fallback breakdowns are placeholders, not tasks worth creating
+        persistable = {i: r for i, r in results.items() if i not in fallbacks}
+        if request.persist and persistable:
+            now = datetime.utcnow()
+            docs_by_index = {
+                index: split_task_documents(project_id, result, now)
+                for index, result in sorted(persistable.items())
+            }
+            try:
+                await persist_split_tasks(
+                    project_id, [doc for docs in docs_by_index.values() for doc in docs], db
+                )
+                summary["created"] = {
+                    index: [str(doc["_id"]) for doc in docs] for index, docs in docs_by_index.items()
+                }
+            except Exception as e:
+                summary["persist_error"] = str(e)
+        yield dumps({"summary": summary}) + b"\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,31 @@
+"""
+Debug API routes - Download stored request profiles.
+"""
+import os
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from app.core.profiling import PROFILE_FILE_RE, profile_dir, profiling_allowed
+
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+MEDIA_TYPES = {
+    "folded": "text/plain",
+    "txt": "text/plain",
+    "prof": "application/octet-stream",
+}
+
+
+@router.get("/profiles/{filename}", include_in_schema=False)
+async def get_profile(filename: str, request: Request):
+    """Download a profile file named by an X-Profile-Id response header (e.g. <id>.folded)."""
+    if not profiling_allowed(request.headers):
+        raise HTTPException(status_code=403, detail="Profiling not allowed")
+    if not PROFILE_FILE_RE.match(filename):
+        raise HTTPException(status_code=400, detail="Invalid profile file name")
+    
+    path = os.path.join(profile_dir(), filename)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return FileResponse(path, media_type=MEDIA_TYPES[filename.rsplit(".", 1)[1]], filename=filename)
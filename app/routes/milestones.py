@@ -3,11 +3,17 @@ Milestones API routes - CRUD operations for milestones.
 """
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.core.database import get_database
+from app.core.change_feed import get_change_feed
+from app.core.loaders import load_by_ids, parse_ids
+from app.core.revisions import bump_revision, get_revision, revision_headers, not_modified
+from app.core.serialization import FastJSONResponse
+from app.core.versioning import parse_expected_version, version_filter, raise_for_missing, VERSION_HEADER
 from app.models import MilestoneCreate, MilestoneInDB
 
 router = APIRouter(prefix="/projects/{project_id}/milestones", tags=["milestones"])
@@ -27,24 +33,45 @@ async def create_milestone(
     milestone_dict["project_id"] = project_id
     milestone_dict["created_at"] = datetime.utcnow()
     milestone_dict["updated_at"] = datetime.utcnow()
+    milestone_dict["version"] = 1
     
     result = await db.milestones.insert_one(milestone_dict)
+    await bump_revision(db, project_id)
+    get_change_feed().notify(
+        project_id, "milestones", "insert", result.inserted_id, document=milestone_dict,
+    )
     
     return {"id": str(result.inserted_id), "message": "Milestone created successfully"}
 
 
-@router.get("/", response_model=List[dict])
+@router.get("/", response_model=List[dict], response_class=FastJSONResponse)
 async def list_milestones(
     project_id: str,
+    request: Request,
+    ids: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    """List all milestones for a project."""
-    cursor = db.milestones.find({"project_id": project_id})
-    milestones = []
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        milestones.append(doc)
-    return milestones
+    """
+    List all milestones for a project.
+    Supports conditional GET via If-None-Match on the project revision.
+    With `ids` (comma-separated milestone IDs) the response is
+    {"milestones": [...in request order], "missing": [...]}.
+    """
+    headers = {}
+    if ObjectId.is_valid(project_id):
+        project = await get_revision(db, project_id)
+        if project:
+            headers = revision_headers(request, project)
+            cached = not_modified(request, headers)
+            if cached:
+                return cached
+    
+    if ids is not None:
+        milestones, missing = await load_by_ids(db, "milestones", project_id, parse_ids(ids))
+        return FastJSONResponse({"milestones": milestones, "missing": missing}, headers=headers)
+    
+    milestones = await db.milestones.find({"project_id": project_id}).to_list(None)
+    return FastJSONResponse(milestones, headers=headers)
 
 
 @router.patch("/{milestone_id}", response_model=dict)
@@ -52,25 +79,52 @@ async def update_milestone(
     project_id: str,
     milestone_id: str,
     update: dict,  # Partial update
+    response: Response,
+    x_version: Optional[str] = Header(None),
+    if_match: Optional[str] = Header(None),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    """Update a milestone."""
+    """
+    Update a milestone atomically.
+    Send the milestone's version in X-Version to reject concurrent edits with 409.
+    """
     if not ObjectId.is_valid(milestone_id):
         raise HTTPException(status_code=400, detail="Invalid milestone ID")
     
+    expected_version = parse_expected_version(x_version, if_match)
+    
+    # Server-managed fields
+    update.pop("_id", None)
+    update.pop("version", None)
+    
     update["updated_at"] = datetime.utcnow()
     if "is_completed" in update and update["is_completed"]:
         update["completed_at"] = datetime.utcnow()
     
-    result = await db.milestones.update_one(
-        {"_id": ObjectId(milestone_id), "project_id": project_id},
-        {"$set": update},
+    query = {"_id": ObjectId(milestone_id), "project_id": project_id}
+    if expected_version is not None:
+        query.update(version_filter(expected_version))
+    
+    previous = await db.milestones.find_one_and_update(
+        query,
+        {"$set": update, "$inc": {"version": 1}},
+        projection={"version": 1},
+        return_document=ReturnDocument.BEFORE,
     )
+    if previous is None:
+        await raise_for_missing(
+            db.milestones, {"_id": ObjectId(milestone_id), "project_id": project_id},
+            expected_version, "Milestone",
+        )
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Milestone not found")
+    version = previous.get("version", 0) + 1
+    response.headers[VERSION_HEADER] = str(version)
+    await bump_revision(db, project_id)
+    get_change_feed().notify(
+        project_id, "milestones", "update", milestone_id, fields={**update, "version": version},
+    )
     
-    return {"message": "Milestone updated successfully"}
+    return {"message": "Milestone updated successfully", "version": version}
 
 
 @router.delete("/{milestone_id}", response_model=dict)
@@ -91,4 +145,7 @@ async def delete_milestone(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Milestone not found")
     
+    await bump_revision(db, project_id)
+    get_change_feed().notify(project_id, "milestones", "delete", milestone_id)
+    
     return {"message": "Milestone deleted successfully"}
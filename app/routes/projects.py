@@ -1,15 +1,27 @@
 """
 Projects API routes - CRUD operations for projects.
 """
+import asyncio
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.core.database import get_database
+from app.core.change_feed import get_change_feed, encode_delta
+from app.core.revisions import revision_headers, not_modified, get_revision
+from app.core.labels import get_label_counts
+from app.core.users import get_user_directory
+from app.core.config import get_settings
+from app.core.serialization import FastJSONResponse, ndjson_rows
+from app.core.versioning import parse_expected_version, version_filter, raise_for_missing, VERSION_HEADER
 from app.models import ProjectCreate, ProjectUpdate, ProjectInDB, EventCreate, EventType
 
+settings = get_settings()
+
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 
@@ -23,13 +35,16 @@ async def create_project(
     project_dict["created_at"] = datetime.utcnow()
     project_dict["updated_at"] = datetime.utcnow()
     project_dict["is_active"] = True
+    project_dict["version"] = 1
+    project_dict["revision"] = 1
+    project_dict["revised_at"] = project_dict["updated_at"]
     
     result = await db.projects.insert_one(project_dict)
     
     return {"id": str(result.inserted_id), "message": "Project created successfully"}
 
 
-@router.get("/", response_model=List[dict])
+@router.get("/", response_model=List[dict], response_class=FastJSONResponse)
 async def list_projects(
     skip: int = 0,
     limit: int = 20,
@@ -38,17 +53,14 @@ async def list_projects(
 ):
     """List all projects with pagination."""
     query = {"is_active": True} if active_only else {}
-    cursor = db.projects.find(query).skip(skip).limit(limit)
-    projects = []
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        projects.append(doc)
-    return projects
+    projects = await db.projects.find(query).skip(skip).limit(limit).to_list(None)
+    return FastJSONResponse(projects)
 
 
-@router.get("/{project_id}", response_model=dict)
+@router.get("/{project_id}", response_model=dict, response_class=FastJSONResponse)
 async def get_project(
     project_id: str,
+    request: Request,
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
     """Get a specific project by ID."""
@@ -59,32 +71,55 @@ async def get_project(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    project["_id"] = str(project["_id"])
-    return project
+    headers = revision_headers(request, project)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
+    
+    return FastJSONResponse(project, headers=headers)
 
 
 @router.patch("/{project_id}", response_model=dict)
 async def update_project(
     project_id: str,
     update: ProjectUpdate,
+    response: Response,
+    x_version: Optional[str] = Header(None),
+    if_match: Optional[str] = Header(None),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    """Update a project."""
+    """
+    Update a project atomically.
+    Send the project's version in X-Version to reject concurrent edits with 409.
+    """
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
     
+    expected_version = parse_expected_version(x_version, if_match)
+    
     update_dict = {k: v for k, v in update.model_dump().items() if v is not None}
     update_dict["updated_at"] = datetime.utcnow()
+    update_dict["revised_at"] = update_dict["updated_at"]
     
-    result = await db.projects.update_one(
-        {"_id": ObjectId(project_id)},
-        {"$set": update_dict},
+    query = {"_id": ObjectId(project_id)}
+    if expected_version is not None:
+        query.update(version_filter(expected_version))
+    
+    previous = await db.projects.find_one_and_update(
+        query,
+        {"$set": update_dict, "$inc": {"version": 1, "revision": 1}},
+        projection={"version": 1},
+        return_document=ReturnDocument.BEFORE,
     )
+    if previous is None:
+        await raise_for_missing(
+            db.projects, {"_id": ObjectId(project_id)}, expected_version, "Project",
+        )
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Project not found")
+    version = previous.get("version", 0) + 1
+    response.headers[VERSION_HEADER] = str(version)
     
-    return {"message": "Project updated successfully"}
+    return {"message": "Project updated successfully", "version": version}
 
 
 @router.delete("/{project_id}", response_model=dict)
@@ -98,7 +133,10 @@ async def delete_project(
     
     result = await db.projects.update_one(
         {"_id": ObjectId(project_id)},
-        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}},
+        {
+            "$set": {"is_active": False, "updated_at": datetime.utcnow(), "revised_at": datetime.utcnow()},
+            "$inc": {"version": 1, "revision": 1},
+        },
     )
     
     if result.matched_count == 0:
@@ -107,14 +145,18 @@ async def delete_project(
     return {"message": "Project deleted successfully"}
 
 
-@router.get("/{project_id}/state", response_model=dict)
+@router.get("/{project_id}/state", response_model=dict, response_class=FastJSONResponse)
 async def get_project_state(
     project_id: str,
+    request: Request,
+    include_users: bool = False,
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
     """
     Get full project state including tasks, milestones, risks, and recent events.
     Matches ApiProjectState on frontend.
+    Answers If-None-Match with 304 before touching the other collections.
+    With include_users, "users" maps the owner and assignee IDs to users.
     """
     if not ObjectId.is_valid(project_id):
         raise HTTPException(status_code=400, detail="Invalid project ID")
@@ -123,40 +165,130 @@ async def get_project_state(
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    project["_id"] = str(project["_id"])
+    headers = revision_headers(request, project)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
     
     # Fetch related entities
-    tasks = []
-    async for doc in db.tasks.find({"project_id": project_id}):
-        doc["_id"] = str(doc["_id"])
-        tasks.append(doc)
-    
-    milestones = []
-    async for doc in db.milestones.find({"project_id": project_id}):
-        doc["_id"] = str(doc["_id"])
-        milestones.append(doc)
-    
-    risks = []
-    async for doc in db.risks.find({"project_id": project_id}):
-        doc["_id"] = str(doc["_id"])
-        risks.append(doc)
+    tasks = await db.tasks.find({"project_id": project_id}).to_list(None)
+    milestones = await db.milestones.find({"project_id": project_id}).to_list(None)
+    risks = await db.risks.find({"project_id": project_id}).to_list(None)
     
     # Get recent events
     from datetime import timedelta
     # Use last 7 days of events as "recent" for the UI feed
     recent_cutoff = datetime.utcnow() - timedelta(days=7)
-    recent_events = []
-    async for doc in db.events.find({
+    recent_events = await db.events.find({
         "project_id": project_id,
         "timestamp": {"$gte": recent_cutoff},
-    }).sort("timestamp", -1).limit(100):
-        doc["_id"] = str(doc["_id"])
-        recent_events.append(doc)
+    }).sort("timestamp", -1).limit(100).to_list(None)
     
-    return {
+    state = {
         "project": project,
         "tasks": tasks,
         "milestones": milestones,
         "risks": risks,
         "recent_events": recent_events,
     }
+    if include_users:
+        user_ids = [project.get("owner_id")] + [task.get("assignee_id") for task in tasks]
+        state["users"] = await get_user_directory().resolve(db, filter(None, user_ids))
+    
+    return FastJSONResponse(state, headers=headers)
+
+
+@router.get("/{project_id}/events/export")
+async def export_events(
+    project_id: str,
+    since: Optional[datetime] = None,
+    event_type: Optional[EventType] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """
+    Stream the project's audit trail as NDJSON, oldest first.
+    Pass `since` (timestamp of the last row already seen) for incremental syncs.
+    """
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    
+    project = await db.projects.find_one({"_id": ObjectId(project_id)}, {"_id": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    query = {"project_id": project_id}
+    if since:
+        query["timestamp"] = {"$gte": since}
+    if event_type:
+        query["event_type"] = event_type.value
+    
+    cursor = db.events.find(query, batch_size=settings.export_batch_size).sort("timestamp", 1)
+    return StreamingResponse(ndjson_rows(cursor), media_type="application/x-ndjson")
+
+
+@router.get("/{project_id}/labels", response_model=dict, response_class=FastJSONResponse)
+async def get_project_labels(
+    project_id: str,
+    request: Request,
+    limit: int = Query(50, ge=1, le=1000),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """
+    Labels used in the project, most frequent first.
+    Served from a per-project index that is rebuilt only after task writes.
+    """
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    
+    project = await get_revision(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    headers = revision_headers(request, project)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
+    
+    counts = await get_label_counts(db, project)
+    return FastJSONResponse({"labels": counts[:limit], "total": len(counts)}, headers=headers)
+
+
+@router.get("/{project_id}/changes")
+async def stream_project_changes(
+    project_id: str,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """
+    Server-Sent Events stream of task, milestone, risk and event deltas.
+    Fetch /state once, then apply deltas; on a "resync" event refetch /state.
+    """
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    
+    project = await db.projects.find_one({"_id": ObjectId(project_id)}, {"_id": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    feed = get_change_feed()
+    queue = feed.subscribe(project_id)
+    
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    delta = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                event = delta.get("collection", delta["op"])
+                yield f"event: {event}\ndata: {encode_delta(delta)}\n\n"
+        finally:
+            feed.unsubscribe(project_id, queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -3,26 +3,37 @@ Tasks API routes - CRUD operations for tasks.
 """
 from typing import List, Optional
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, status
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+from pymongo import InsertOne, UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
 
+from app.core.config import get_settings
 from app.core.database import get_database
-from app.models import TaskCreate, TaskUpdate, TaskStatus, EventType
+from app.core.events import get_event_sink
+from app.core.change_feed import get_change_feed
+from app.core.loaders import get_loader, load_by_ids, parse_ids
+from app.core.revisions import bump_revision, get_revision, revision_headers, not_modified
+from app.core.serialization import FastJSONResponse, ndjson_rows
+from app.core.versioning import parse_expected_version, version_filter, raise_for_missing, VERSION_HEADER
+from app.models import TaskCreate, TaskUpdate, TaskBulkCreate, TaskBulkUpdate, TaskStatus, EventType
+
+settings = get_settings()
 
 router = APIRouter(prefix="/projects/{project_id}/tasks", tags=["tasks"])
 
 
-async def log_event(
-    db: AsyncIOMotorDatabase,
+def build_event(
     project_id: str,
     event_type: EventType,
     entity_id: str,
     actor: str,
     details: dict,
-):
-    """Log an event to the audit trail."""
-    event = {
+) -> dict:
+    """Build an audit trail event document for a task."""
+    return {
         "project_id": project_id,
         "event_type": event_type.value,
         "entity_type": "task",
@@ -31,13 +42,85 @@ async def log_event(
         "details": details,
         "timestamp": datetime.utcnow(),
     }
-    await db.events.insert_one(event)
+
+
+async def log_event(
+    db: AsyncIOMotorDatabase,
+    project_id: str,
+    event_type: EventType,
+    entity_id: str,
+    actor: str,
+    details: dict,
+    durable: bool = False,
+):
+    """
+    Log an event to the audit trail.
+    Events are buffered and written in batches unless durable is set.
+    """
+    await get_event_sink().emit(
+        [build_event(project_id, event_type, entity_id, actor, details)],
+        durable=durable or settings.event_durable_writes,
+    )
+
+
+def status_event_type(new_status: TaskStatus) -> EventType:
+    """Map a task status change to the event type recorded for it."""
+    if new_status == TaskStatus.COMPLETED:
+        return EventType.TASK_COMPLETED
+    if new_status == TaskStatus.BLOCKED:
+        return EventType.TASK_BLOCKED
+    return EventType.TASK_UPDATED
+
+
+def _write_errors(exc: BulkWriteError) -> dict:
+    """Map failed operation indexes to their error messages."""
+    return {
+        err["index"]: err.get("errmsg", "Write failed")
+        for err in exc.details.get("writeErrors", [])
+    }
+
+
+async def _verify_project(project_id: str, db: AsyncIOMotorDatabase):
+    """Raise if the project ID is invalid or the project does not exist."""
+    if not ObjectId.is_valid(project_id):
+        raise HTTPException(status_code=400, detail="Invalid project ID")
+    
+    project = await db.projects.find_one({"_id": ObjectId(project_id)}, {"_id": 1})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+
+def _task_query(
+    project_id: str,
+    status_filter: Optional[TaskStatus],
+    assignee_id: Optional[str],
+    since: Optional[datetime] = None,
+) -> dict:
+    """Build the task filter shared by the list and export endpoints."""
+    query = {"project_id": project_id}
+    if status_filter:
+        query["status"] = status_filter.value
+    if assignee_id:
+        query["assignee_id"] = assignee_id
+    if since:
+        query["updated_at"] = {"$gte": since}
+    return query
+
+
+def _check_batch_size(size: int):
+    """Reject batches larger than the configured bulk limit."""
+    if size > settings.bulk_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {size} items (max {settings.bulk_max_items})",
+        )
 
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def create_task(
     project_id: str,
     task: TaskCreate,
+    durable: bool = False,
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
     """Create a new task in a project."""
@@ -53,44 +136,233 @@ async def create_task(
     task_dict["project_id"] = project_id
     task_dict["created_at"] = datetime.utcnow()
     task_dict["updated_at"] = datetime.utcnow()
+    task_dict["version"] = 1
     
     result = await db.tasks.insert_one(task_dict)
     task_id = str(result.inserted_id)
+    await bump_revision(db, project_id)
+    get_change_feed().notify(project_id, "tasks", "insert", task_id, document=task_dict)
     
     # Log event
     await log_event(
         db, project_id, EventType.TASK_CREATED, task_id, "system",
-        {"title": task.title, "status": task.status.value},
+        {"title": task.title, "status": task.status.value, "assignee_id": task.assignee_id},
+        durable=durable,
     )
     
     return {"id": task_id, "message": "Task created successfully"}
 
 
-@router.get("/", response_model=List[dict])
+@router.post("/bulk", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def bulk_create_tasks(
+    project_id: str,
+    payload: TaskBulkCreate,
+    durable: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """
+    Create many tasks with a single unordered bulk write.
+    Returns one result per submitted task, in request order.
+    """
+    _check_batch_size(len(payload.tasks))
+    await _verify_project(project_id, db)
+    
+    now = datetime.utcnow()
+    docs = []
+    for task in payload.tasks:
+        task_dict = task.model_dump()
+        task_dict["_id"] = ObjectId()
+        task_dict["project_id"] = project_id
+        task_dict["created_at"] = now
+        task_dict["updated_at"] = now
+        task_dict["version"] = 1
+        docs.append(task_dict)
+    
+    try:
+        await db.tasks.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+        failed = {}
+    except BulkWriteError as e:
+        failed = _write_errors(e)
+    
+    if len(failed) < len(docs):
+        await bump_revision(db, project_id)
+    
+    results = []
+    events = []
+    for index, (task, doc) in enumerate(zip(payload.tasks, docs)):
+        if index in failed:
+            results.append({"index": index, "id": None, "ok": False, "error": failed[index]})
+            continue
+        
+        task_id = str(doc["_id"])
+        results.append({"index": index, "id": task_id, "ok": True})
+        get_change_feed().notify(project_id, "tasks", "insert", task_id, document=doc)
+        events.append(build_event(
+            project_id, EventType.TASK_CREATED, task_id, "system",
+            {"title": task.title, "status": task.status.value, "assignee_id": task.assignee_id},
+        ))
+    
+    await get_event_sink().emit(events, durable=durable or settings.event_durable_writes)
+    
+    return {
+        "created": len(events),
+        "failed": len(failed),
+        "results": results,
+    }
+
+
+@router.patch("/bulk", response_model=dict)
+async def bulk_update_tasks(
+    project_id: str,
+    payload: TaskBulkUpdate,
+    durable: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """
+    Update many tasks with a single unordered bulk write.
+    Returns one result per submitted update, in request order.
+    """
+    _check_batch_size(len(payload.updates))
+    await _verify_project(project_id, db)
+    
+    results: List[Optional[dict]] = [None] * len(payload.updates)
+    for index, item in enumerate(payload.updates):
+        if not ObjectId.is_valid(item.id):
+            results[index] = {"index": index, "id": item.id, "ok": False, "error": "Invalid task ID"}
+    
+    # One lookup for existence and the pre-update fields used in events
+    task_ids = {ObjectId(item.id) for i, item in enumerate(payload.updates) if results[i] is None}
+    current = {}
+    async for doc in db.tasks.find(
+        {"_id": {"$in": list(task_ids)}, "project_id": project_id},
+        {"status": 1, "assignee_id": 1, "version": 1},
+    ):
+        current[str(doc["_id"])] = doc
+    
+    now = datetime.utcnow()
+    ops = []
+    op_indexes = []
+    op_updates = []
+    for index, item in enumerate(payload.updates):
+        if results[index] is not None:
+            continue
+        if item.id not in current:
+            results[index] = {"index": index, "id": item.id, "ok": False, "error": "Task not found"}
+            continue
+        
+        update_dict = {
+            k: v for k, v in item.model_dump(exclude={"id"}).items() if v is not None
+        }
+        if "status" in update_dict:
+            update_dict["status"] = update_dict["status"].value
+        update_dict["updated_at"] = now
+        
+        ops.append(UpdateOne(
+            {"_id": ObjectId(item.id), "project_id": project_id},
+            {"$set": update_dict, "$inc": {"version": 1}},
+        ))
+        op_indexes.append(index)
+        op_updates.append(update_dict)
+    
+    failed = {}
+    if ops:
+        try:
+            await db.tasks.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            failed = _write_errors(e)
+        if len(failed) < len(ops):
+            await bump_revision(db, project_id)
+    
+    events = []
+    for op_index, index in enumerate(op_indexes):
+        item = payload.updates[index]
+        if op_index in failed:
+            results[index] = {"index": index, "id": item.id, "ok": False, "error": failed[op_index]}
+            continue
+        
+        results[index] = {"index": index, "id": item.id, "ok": True}
+        version = current[item.id].get("version", 0) + 1
+        get_change_feed().notify(
+            project_id, "tasks", "update", item.id, fields={**op_updates[op_index], "version": version},
+        )
+        if item.status:
+            events.append(build_event(
+                project_id, status_event_type(item.status), item.id, "system",
+                {
+                    "old_status": current[item.id].get("status"),
+                    "new_status": item.status.value,
+                    "assignee_id": item.assignee_id or current[item.id].get("assignee_id"),
+                },
+            ))
+    
+    await get_event_sink().emit(events, durable=durable or settings.event_durable_writes)
+    
+    return {
+        "updated": len(op_indexes) - len(failed),
+        "failed": len(payload.updates) - len(op_indexes) + len(failed),
+        "results": results,
+    }
+
+
+@router.get("/", response_model=List[dict], response_class=FastJSONResponse)
 async def list_tasks(
     project_id: str,
-    status_filter: Optional[str] = None,
+    request: Request,
+    status_filter: Optional[TaskStatus] = None,
     assignee_id: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    ids: Optional[str] = None,
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    """List tasks in a project with optional filters."""
-    query = {"project_id": project_id}
-    if status_filter:
-        query["status"] = status_filter.value
-    if assignee_id:
-        query["assignee_id"] = assignee_id
+    """
+    List tasks in a project with optional filters.
+    Supports conditional GET via If-None-Match on the project revision.
+    With `ids` (comma-separated task IDs) the other filters are ignored and
+    the response is {"tasks": [...in request order], "missing": [...]}.
+    """
+    headers = {}
+    if ObjectId.is_valid(project_id):
+        project = await get_revision(db, project_id)
+        if project:
+            headers = revision_headers(request, project)
+            cached = not_modified(request, headers)
+            if cached:
+                return cached
+    
+    if ids is not None:
+        tasks, missing = await load_by_ids(db, "tasks", project_id, parse_ids(ids))
+        return FastJSONResponse({"tasks": tasks, "missing": missing}, headers=headers)
+    
+    query = _task_query(project_id, status_filter, assignee_id)
+    tasks = await db.tasks.find(query).skip(skip).limit(limit).to_list(None)
+    return FastJSONResponse(tasks, headers=headers)
+
+
+@router.get("/export")
+async def export_tasks(
+    project_id: str,
+    status_filter: Optional[TaskStatus] = None,
+    assignee_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """
+    Stream tasks as NDJSON (one task per line) without buffering the result.
+    Accepts the list filters plus `since` (tasks updated at or after it);
+    with `since`, rows come in updated_at order so the last row is the next cursor.
+    """
+    await _verify_project(project_id, db)
     
-    cursor = db.tasks.find(query).skip(skip).limit(limit)
-    tasks = []
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        tasks.append(doc)
-    return tasks
+    query = _task_query(project_id, status_filter, assignee_id, since)
+    cursor = db.tasks.find(query, batch_size=settings.export_batch_size)
+    if since:
+        cursor = cursor.sort("updated_at", 1)
+    
+    return StreamingResponse(ndjson_rows(cursor), media_type="application/x-ndjson")
 
 
-@router.get("/{task_id}", response_model=dict)
+@router.get("/{task_id}", response_model=dict, response_class=FastJSONResponse)
 async def get_task(
     project_id: str,
     task_id: str,
@@ -100,15 +372,12 @@ async def get_task(
     if not ObjectId.is_valid(task_id):
         raise HTTPException(status_code=400, detail="Invalid task ID")
     
-    task = await db.tasks.find_one({
-        "_id": ObjectId(task_id),
-        "project_id": project_id,
-    })
+    # Concurrent single-task fetches are batched into one query
+    task = (await get_loader(db, "tasks", project_id).load_many([task_id]))[0]
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    task["_id"] = str(task["_id"])
-    return task
+    return FastJSONResponse(task)
 
 
 @router.patch("/{task_id}", response_model=dict)
@@ -116,45 +385,63 @@ async def update_task(
     project_id: str,
     task_id: str,
     update: TaskUpdate,
+    response: Response,
+    durable: bool = False,
+    x_version: Optional[str] = Header(None),
+    if_match: Optional[str] = Header(None),
     db: AsyncIOMotorDatabase = Depends(get_database),
 ):
-    """Update a task."""
+    """
+    Update a task atomically.
+    Send the task's version in X-Version to reject concurrent edits with 409.
+    """
     if not ObjectId.is_valid(task_id):
         raise HTTPException(status_code=400, detail="Invalid task ID")
     
-    # Get current task for comparison
-    current = await db.tasks.find_one({
-        "_id": ObjectId(task_id),
-        "project_id": project_id,
-    })
-    if not current:
-        raise HTTPException(status_code=404, detail="Task not found")
+    expected_version = parse_expected_version(x_version, if_match)
     
     update_dict = {k: v for k, v in update.model_dump().items() if v is not None}
     if "status" in update_dict:
         update_dict["status"] = update_dict["status"].value
     update_dict["updated_at"] = datetime.utcnow()
     
-    await db.tasks.update_one(
-        {"_id": ObjectId(task_id)},
-        {"$set": update_dict},
+    query = {"_id": ObjectId(task_id), "project_id": project_id}
+    if expected_version is not None:
+        query.update(version_filter(expected_version))
+    
+    # Pre-image gives the old status for the event in the same round trip
+    previous = await db.tasks.find_one_and_update(
+        query,
+        {"$set": update_dict, "$inc": {"version": 1}},
+        projection={"status": 1, "assignee_id": 1, "version": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if previous is None:
+        await raise_for_missing(
+            db.tasks, {"_id": ObjectId(task_id), "project_id": project_id},
+            expected_version, "Task",
+        )
+    
+    version = previous.get("version", 0) + 1
+    response.headers[VERSION_HEADER] = str(version)
+    await bump_revision(db, project_id)
+    get_change_feed().notify(
+        project_id, "tasks", "update", task_id, fields={**update_dict, "version": version},
     )
     
     # Log appropriate event
     if update.status:
-        if update.status == TaskStatus.COMPLETED:
-            event_type = EventType.TASK_COMPLETED
-        elif update.status == TaskStatus.BLOCKED:
-            event_type = EventType.TASK_BLOCKED
-        else:
-            event_type = EventType.TASK_UPDATED
-        
         await log_event(
-            db, project_id, event_type, task_id, "system",
-            {"old_status": current.get("status"), "new_status": update.status.value},
+            db, project_id, status_event_type(update.status), task_id, "system",
+            {
+                "old_status": previous.get("status"),
+                "new_status": update.status.value,
+                "assignee_id": update.assignee_id or previous.get("assignee_id"),
+            },
+            durable=durable,
         )
     
-    return {"message": "Task updated successfully"}
+    return {"message": "Task updated successfully", "version": version}
 
 
 @router.delete("/{task_id}", response_model=dict)
@@ -175,4 +462,7 @@ async def delete_task(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Task not found")
     
+    await bump_revision(db, project_id)
+    get_change_feed().notify(project_id, "tasks", "delete", task_id)
+    
     return {"message": "Task deleted successfully"}
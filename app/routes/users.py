@@ -1,32 +1,43 @@
 """
 Users API routes - Simple user data for name resolution.
 """
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.core.database import get_database
+from app.core.users import get_user_directory, MOCK_USERS  # noqa: F401 (re-exported)
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-# Mock users for MVP name resolution
-MOCK_USERS = {
-    "user_001": {"id": "user_001", "name": "Jay Tech", "role": "Full Stack Dev"},
-    "user_002": {"id": "user_002", "name": "Sarah Chen", "role": "AI Engineer"},
-    "user_003": {"id": "user_003", "name": "Alex Rivier", "role": "PM"},
-    "manager_99": {"id": "manager_99", "name": "Manjesh Prasad", "role": "Senior Manager"},
-    "dev_01": {"id": "dev_01", "name": "Liam Smith", "role": "Senior Dev"},
-    "dev_02": {"id": "dev_02", "name": "Ava Johnson", "role": "Backend Dev"},
-    "designer_01": {"id": "designer_01", "name": "Noah Miller", "role": "UX Designer"},
-    "qa_01": {"id": "qa_01", "name": "Isabella Brown", "role": "QA Analyst"},
-}
+RESOLVE_MAX_IDS = 500
+
 
 @router.get("/", response_model=List[dict])
-async def list_users():
+async def list_users(db: AsyncIOMotorDatabase = Depends(get_database)):
     """List all available users."""
-    return list(MOCK_USERS.values())
+    return await get_user_directory().list_users(db)
+
+@router.get("/resolve", response_model=dict)
+async def resolve_users(
+    ids: str = Query(..., description="Comma-separated user IDs"),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """
+    Resolve many user IDs in one call.
+    Returns {"users": {id: user}, "missing": [ids with no user]}.
+    """
+    user_ids = list(dict.fromkeys(uid.strip() for uid in ids.split(",") if uid.strip()))
+    if len(user_ids) > RESOLVE_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {RESOLVE_MAX_IDS} IDs per request")
+    
+    users = await get_user_directory().resolve(db, user_ids)
+    return {"users": users, "missing": [uid for uid in user_ids if uid not in users]}
 
 @router.get("/{user_id}", response_model=dict)
-async def get_user(user_id: str):
+async def get_user(user_id: str, db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get a specific user by ID."""
-    user = MOCK_USERS.get(user_id)
+    user = await get_user_directory().get(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -0,0 +1,120 @@
+"""
+Benchmark - Agent response parsing: success rate on a corpus and parse time.
+Compares the previous per-agent STATUS/RISKS loop plus _parse_recommendations
+with BaseAgent._parse_response. A response counts as parsed when status,
+risk count, recommendation titles, priorities and affected entities all
+match the corpus expectations.
+Run: python -m benchmarks.bench_parser [rounds]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+from app.agents import RiskAgent
+from app.models import AgentRecommendation
+
+CORPUS = Path(__file__).parent / "corpus" / "agent_responses.jsonl"
+
+
+def parse_previous(raw_text: str) -> tuple:
+    """The parsing the agents did before: a risk loop, then a second scan."""
+    lines = raw_text.split("\n")
+    status_summary = ""
+    risks = []
+    in_risks = False
+    
+    for line in lines:
+        line = line.strip()
+        if line.startswith("STATUS:"):
+            status_summary = line.replace("STATUS:", "").strip()
+        elif line == "RISKS:" or line == "RISKS":
+            in_risks = True
+        elif line.startswith("RECOMMENDATIONS:") or line.startswith("ACTION:"):
+            in_risks = False
+        elif in_risks and line.startswith("-"):
+            risks.append(line[1:].strip())
+    
+    recommendations = []
+    current_rec = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("TITLE:") or line.startswith("- TITLE:"):
+            if current_rec:
+                recommendations.append(current_rec)
+            current_rec = AgentRecommendation(
+                title=line.replace("TITLE:", "").replace("- ", "").strip(),
+                priority="medium",
+                category="risk",
+                suggestion="",
+                reasoning="",
+                affected_entities=[],
+            )
+        elif current_rec:
+            if line.startswith("PRIORITY:"):
+                priority = line.replace("PRIORITY:", "").strip().lower()
+                if priority in ["low", "medium", "high", "critical"]:
+                    current_rec.priority = priority
+            elif line.startswith("CATEGORY:"):
+                current_rec.category = line.replace("CATEGORY:", "").strip().lower()
+            elif line.startswith("SUGGESTION:"):
+                current_rec.suggestion = line.replace("SUGGESTION:", "").strip()
+            elif line.startswith("REASON:") or line.startswith("REASONING:"):
+                current_rec.reasoning = line.split(":", 1)[1].strip()
+            elif line.startswith("AFFECTS:"):
+                entities = line.replace("AFFECTS:", "").strip()
+                current_rec.affected_entities = [e.strip() for e in entities.split(",")]
+    if current_rec:
+        recommendations.append(current_rec)
+    
+    return status_summary, risks, recommendations
+
+
+def matches(parsed: tuple, expected: dict) -> bool:
+    status_summary, risks, recommendations = parsed
+    return (
+        status_summary == expected["status"]
+        and len(risks) == expected["risks"]
+        and [
+            {"title": r.title, "priority": r.priority, "affected_entities": r.affected_entities}
+            for r in recommendations
+        ] == expected["recommendations"]
+    )
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    corpus = [json.loads(line) for line in CORPUS.read_text().splitlines() if line.strip()]
+    agent = RiskAgent()
+    parsers = {
+        "previous (two scans)": parse_previous,
+        "BaseAgent._parse_response": agent._parse_response,
+    }
+    
+    # Time only responses every parser handles, so the work done is comparable
+    common = [
+        case for case in corpus
+        if all(matches(parse(case["text"]), case["expected"]) for parse in parsers.values())
+    ]
+    
+    print(f"Corpus: {len(corpus)} responses, timed on the {len(common)} all parsers handle ({rounds} rounds)")
+    for label, parse in parsers.items():
+        failures = [case["name"] for case in corpus if not matches(parse(case["text"]), case["expected"])]
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for case in common:
+                parse(case["text"])
+        elapsed = (time.perf_counter() - start) / (rounds * len(common))
+        rate = (len(corpus) - len(failures)) / len(corpus)
+        print(f"  {label:<28} success {rate:6.1%}  {elapsed * 1e6:7.1f} us/response")
+        if failures:
+            print(f"    failed: {', '.join(failures)}")
+    
+    # Regression gate: every corpus response must parse with the shared parser
+    return 0 if all(matches(agent._parse_response(c["text"]), c["expected"]) for c in corpus) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
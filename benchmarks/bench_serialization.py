@@ -0,0 +1,128 @@
+"""
+Benchmark - JSON encode time and payload size for a large project state.
+Compares the previous path (str() _id loops + jsonable_encoder + json.dumps)
+with FastJSONResponse, and reports gzip/brotli sizes.
+Run: python -m benchmarks.bench_serialization [num_tasks]
+"""
+import gzip
+import json
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from app.core.compression import brotli
+from app.core.serialization import dumps
+
+STATUSES = ["pending", "in_progress", "blocked", "in_review", "completed", "cancelled"]
+
+
+def build_state(num_tasks: int) -> dict:
+    """Build a synthetic /state payload with raw Mongo types."""
+    project_id = str(ObjectId())
+    now = datetime.utcnow()
+    task_ids = [ObjectId() for _ in range(num_tasks)]
+    
+    tasks = [
+        {
+            "_id": task_id,
+            "title": f"Task {i}: implement component {i % 97}",
+            "description": "Deliver the component described in the spec and hand off for review.",
+            "status": STATUSES[i % len(STATUSES)],
+            "assignee_id": f"dev_{i % 12:02d}",
+            "priority": i % 5 + 1,
+            "due_date": now + timedelta(days=i % 60),
+            "dependencies": [str(task_ids[i - 1])] if i else [],
+            "labels": ["backend", "api"] if i % 2 else ["frontend"],
+            "milestone_id": None,
+            "project_id": project_id,
+            "created_at": now - timedelta(days=30),
+            "updated_at": now,
+            "version": 1,
+        }
+        for i, task_id in enumerate(task_ids)
+    ]
+    events = [
+        {
+            "_id": ObjectId(),
+            "project_id": project_id,
+            "event_type": "task_updated",
+            "entity_type": "task",
+            "entity_id": str(task_ids[i]),
+            "actor": "system",
+            "details": {"old_status": "pending", "new_status": "in_progress"},
+            "timestamp": now - timedelta(minutes=i),
+        }
+        for i in range(min(100, num_tasks))
+    ]
+    return {
+        "project": {"_id": ObjectId(project_id), "name": "Benchmark", "created_at": now},
+        "tasks": tasks,
+        "milestones": [],
+        "risks": [],
+        "recent_events": events,
+    }
+
+
+def copy_state(state: dict) -> dict:
+    """Shallow-copy documents so the str() conversion can run repeatedly."""
+    return {
+        key: dict(value) if isinstance(value, dict) else [dict(doc) for doc in value]
+        for key, value in state.items()
+    }
+
+
+def encode_previous(state: dict) -> bytes:
+    """What the routes did before: stringify _id per document, then jsonable_encoder."""
+    state["project"]["_id"] = str(state["project"]["_id"])
+    for key in ("tasks", "milestones", "risks", "recent_events"):
+        for doc in state[key]:
+            doc["_id"] = str(doc["_id"])
+    return json.dumps(
+        jsonable_encoder(state),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def timed(fn, state: dict, rounds: int) -> tuple:
+    best = float("inf")
+    body = b""
+    for _ in range(rounds):
+        payload = copy_state(state)
+        start = time.perf_counter()
+        body = fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best, body
+
+
+def main():
+    num_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rounds = 5
+    state = build_state(num_tasks)
+    
+    previous_time, previous_body = timed(encode_previous, state, rounds)
+    fast_time, fast_body = timed(dumps, state, rounds)
+    
+    print(f"State with {num_tasks} tasks (best of {rounds})")
+    print(f"  jsonable_encoder + json.dumps: {previous_time * 1000:8.1f} ms  {len(previous_body):>10,} bytes")
+    print(f"  FastJSONResponse (orjson):     {fast_time * 1000:8.1f} ms  {len(fast_body):>10,} bytes")
+    print(f"  speedup: {previous_time / fast_time:.1f}x")
+    
+    start = time.perf_counter()
+    gzipped = gzip.compress(fast_body, compresslevel=6)
+    print(f"  gzip (level 6):   {len(gzipped):>10,} bytes  {(time.perf_counter() - start) * 1000:6.1f} ms")
+    if brotli is not None:
+        start = time.perf_counter()
+        compressed = brotli.compress(fast_body, quality=4)
+        print(f"  brotli (q4):      {len(compressed):>10,} bytes  {(time.perf_counter() - start) * 1000:6.1f} ms")
+    else:
+        print("  brotli not installed - skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark - Memory and formatting time of the agents' task snapshot.
+Compares projected task dicts formatted once per agent (the previous path)
+with a TaskTable built once and shared by the four analysis agents.
+Run: python -m benchmarks.bench_snapshot [num_tasks]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+
+from app.agents.snapshot import TaskTable
+from benchmarks.bench_serialization import build_state
+
+FIELDS = ("_id", "title", "status", "due_date", "assignee_id", "dependencies")
+AGENTS = 4
+
+
+def project(tasks: list) -> list:
+    """What the projected tasks query returns: only the fields agents read."""
+    return [{field: task[field] for field in FIELDS} for task in tasks]
+
+
+def format_dicts(tasks: list) -> list:
+    """The previous per-agent TASKS section loop over task dicts."""
+    lines = []
+    for t in tasks:
+        status = t.get("status", "unknown")
+        due = t.get("due_date", "no due date")
+        assignee = t.get("assignee_id", "unassigned")
+        deps = ", ".join(t.get("dependencies", [])) or "none"
+        lines.append(
+            f"  - [{status}] {t.get('title')} | Due: {due} | Assignee: {assignee} | Deps: {deps}"
+        )
+    return lines
+
+
+def retained(build) -> tuple:
+    """Bytes still allocated by build()'s result, and the result."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def best_of(fn, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    num_tasks = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rounds = 3
+    source = build_state(num_tasks)["tasks"]
+    for task in source:
+        task["_id"] = str(task["_id"])
+    
+    # Both structures share the source's strings, so this measures the containers
+    dict_bytes, dicts = retained(lambda: project([dict(task) for task in source]))
+    table_bytes, table = retained(lambda: TaskTable.from_documents(dict(task) for task in source))
+    
+    assert table.format_lines() == format_dicts(dicts)
+    
+    dict_time = best_of(lambda: [format_dicts(dicts) for _ in range(AGENTS)], rounds)
+    table_time = best_of(lambda: TaskTable.from_documents(dicts).format_lines(), rounds)
+    
+    print(f"Snapshot of {num_tasks} tasks (best of {rounds})")
+    print(f"  task dicts:  {dict_bytes / 2 ** 20:8.1f} MiB retained")
+    print(f"  TaskTable:   {table_bytes / 2 ** 20:8.1f} MiB retained")
+    print(f"  format x{AGENTS} from dicts:          {dict_time * 1000:8.1f} ms")
+    print(f"  build table + format once:     {table_time * 1000:8.1f} ms")
+    print(f"  speedup: {dict_time / table_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
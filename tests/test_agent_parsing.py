@@ -0,0 +1,77 @@
+"""
+Tests for BaseAgent._parse_response, the shared agent response parser.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from app.agents import RiskAgent
+
+CORPUS = Path(__file__).resolve().parent.parent / "benchmarks" / "corpus" / "agent_responses.jsonl"
+CASES = [json.loads(line) for line in CORPUS.read_text().splitlines() if line.strip()]
+
+
+@pytest.fixture(scope="module")
+def parse():
+    return RiskAgent()._parse_response
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case["name"] for case in CASES])
+def test_corpus(parse, case):
+    status_summary, risks, recommendations = parse(case["text"])
+    expected = case["expected"]
+    assert status_summary == expected["status"]
+    assert len(risks) == expected["risks"]
+    assert [
+        {"title": r.title, "priority": r.priority, "affected_entities": r.affected_entities}
+        for r in recommendations
+    ] == expected["recommendations"]
+
+
+def test_trailing_prose_is_not_a_risk(parse):
+    _, risks, _ = parse("STATUS: ok\nRISKS:\n- r1\nOverall the project looks healthy.")
+    assert risks == ["r1"]
+
+
+def test_prose_between_risk_items_is_skipped(parse):
+    _, risks, _ = parse("RISKS:\n- r1\nSee the notes below.\n* r2\n2. r3\n")
+    assert risks == ["r1", "r2", "r3"]
+
+
+def test_inline_risk_after_heading(parse):
+    _, risks, _ = parse("RISKS: Vendor contract expires soon\n- Staffing gap\n")
+    assert risks == ["Vendor contract expires soon", "Staffing gap"]
+
+
+def test_bulleted_heading_is_not_a_risk(parse):
+    _, risks, _ = parse("## Risks\n- r1\n## Recommendations\n- Title: Fix\n")
+    assert risks == ["r1"]
+
+
+def test_stray_field_ends_risks(parse):
+    _, risks, recommendations = parse("RISKS:\n- r1\nACTION: do something\n- not a risk\n")
+    assert risks == ["r1"]
+    assert recommendations == []
+
+
+def test_recommendation_fields(parse):
+    _, _, recommendations = parse(
+        "TITLE: Unblock checkout\n"
+        "PRIORITY: **Critical**\n"
+        "CATEGORY: [Coordination]\n"
+        "SUGGESTION: Pair dev_02 with dev_05\n"
+        "  on the webhook handler\n"
+        "REASON: Milestone depends on it\n"
+        "AFFECTS: T4, none, T9\n"
+    )
+    (rec,) = recommendations
+    assert rec.priority == "critical"
+    assert rec.category == "coordination"
+    assert rec.suggestion == "Pair dev_02 with dev_05 on the webhook handler"
+    assert rec.reasoning == "Milestone depends on it"
+    assert rec.affected_entities == ["T4", "T9"]
+
+
+def test_empty_response(parse):
+    assert parse("") == ("", [], [])
@@ -0,0 +1,94 @@
+"""
+Tests for delta prompting: the base run, its age and the change budget.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.agents import delta
+from app.agents.orchestrator import AgentOrchestrator
+from app.core.memory_db import MemoryDatabase
+from app.routes.agents import get_project_state
+
+RESPONSE = "STATUS: on track\nRISKS:\n- none\n"
+START = datetime(2026, 3, 2, 9, 0)
+
+
+class Clock(datetime):
+    """datetime whose utcnow() the test moves forward."""
+
+    now = START
+
+    @classmethod
+    def utcnow(cls):
+        return cls.now
+
+
+@pytest.fixture
+def project(monkeypatch):
+    monkeypatch.setattr(delta, "datetime", Clock)
+    monkeypatch.setattr(Clock, "now", START)
+    monkeypatch.setattr(delta.settings, "delta_max_changes", 2)
+    monkeypatch.setattr(delta.settings, "delta_max_age_hours", 24)
+
+    async def respond(prompt, system_prompt, temperature=0.3, **kw):
+        return RESPONSE
+
+    orchestrator = AgentOrchestrator()
+    monkeypatch.setattr(orchestrator.planning_agent.llm, "structured_output", respond)
+
+    db = MemoryDatabase("test")
+
+    async def setup():
+        project_id = str((await db.projects.insert_one({"name": "Launch"})).inserted_id)
+        task_ids = [
+            (await db.tasks.insert_one({
+                "project_id": project_id, "title": f"Task {i}", "status": "pending",
+            })).inserted_id
+            for i in range(5)
+        ]
+        return project_id, task_ids
+
+    project_id, task_ids = asyncio.run(setup())
+
+    def run() -> str:
+        async def analyze():
+            state = await get_project_state(project_id, db, orchestrator.required_fields())
+            return await orchestrator.run_single_agent("planning", state, db)
+        return asyncio.run(analyze()).analysis_mode
+
+    def complete(task_id):
+        asyncio.run(db.tasks.update_one({"_id": task_id}, {"$set": {"status": "completed"}}))
+
+    return run, complete, task_ids
+
+
+def test_delta_runs_keep_the_full_run_as_base(project):
+    run, complete, task_ids = project
+    assert run() == "full"
+
+    complete(task_ids[0])
+    Clock.now = START + timedelta(hours=20)
+    assert run() == "delta"
+
+    # 30h after the full run: a delta run at 20h must not have renewed the base
+    Clock.now = START + timedelta(hours=30)
+    assert run() == "full"
+
+    Clock.now = START + timedelta(hours=31)
+    assert run() == "delta"
+
+
+def test_changes_accumulate_against_the_base(project):
+    run, complete, task_ids = project
+    assert run() == "full"
+
+    complete(task_ids[0])
+    complete(task_ids[1])
+    assert run() == "delta"
+
+    # One change since the delta run, but three since the full run
+    complete(task_ids[2])
+    assert run() == "full"
+    assert run() == "delta"
@@ -0,0 +1,52 @@
+"""
+Tests for SimilarityCache, the near-duplicate cache for ticket splits.
+"""
+import pytest
+
+from app.agents.similarity import SimilarityCache
+
+
+@pytest.fixture
+def cache():
+    return SimilarityCache(threshold=0.88, max_entries=100, ttl_seconds=3600)
+
+
+@pytest.mark.parametrize("stored, query", [
+    ("Add Stripe checkout", "Stripe checkout integration"),
+    ("Implement login page", "Login pages"),
+    ("Upgrade Postgres 15", "upgrade postgres 15!"),
+])
+def test_near_duplicates_hit(cache, stored, query):
+    cache.store("p1", stored, None, "split")
+    assert cache.lookup("p1", query) is not None
+
+
+@pytest.mark.parametrize("stored, query", [
+    ("Stripe checkout", "Stripe refunds"),
+    ("Upgrade Postgres 15", "Upgrade Postgres 16"),
+    (
+        "Migrate the billing service from MySQL to Postgres",
+        "Migrate the billing service from Postgres to MySQL",
+    ),
+    (
+        "Add user authentication with email and password login",
+        "Remove user authentication with email and password login",
+    ),
+    ("Enable rate limiting on the public API", "Disable rate limiting on the public API"),
+])
+def test_different_work_misses(cache, stored, query):
+    cache.store("p1", stored, None, "split")
+    assert cache.lookup("p1", query) is None
+
+
+def test_stop_word_topics_are_not_cached(cache):
+    cache.store("p1", "Add new feature", None, "split")
+    assert cache.lookup("p1", "Implement support") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_context_and_scope_must_match(cache):
+    cache.store("p1", "Stripe checkout", "Use Stripe API v2", "split")
+    assert cache.lookup("p1", "Stripe checkout", "Use Stripe API v3") is None
+    assert cache.lookup("p2", "Stripe checkout", "Use Stripe API v2") is None
+    assert cache.lookup("p1", "Stripe checkout", "Use Stripe API v2") == ("split", 1.0)